@@ -18,6 +18,11 @@ OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 ASSETS_DIR = os.path.join(BASE_DIR, "assets")
 FONTS_DIR = os.path.join(ASSETS_DIR, "fonts")
 MUSIC_DIR = os.path.join(ASSETS_DIR, "music")
+CACHE_DIR = os.path.join(BASE_DIR, "data", "cache") # Persistent caches shared across runs
+
+# Caption Rendering
+FONT_CACHE_SIZE = 64 # (font path, size) pairs kept loaded
+LAYOUT_CACHE_DIR = os.path.join(CACHE_DIR, "layouts")
 
 # Generation Config
 DAILY_LONG_VIDEO_COUNT = 1
@@ -27,5 +32,67 @@ DAILY_SHORTS_COUNT = 2
 LONG_VIDEO_SIZE = (1920, 1080)
 SHORTS_SIZE = (1080, 1920)
 FPS = 30
+KEN_BURNS_ZOOM_RATE = 0.04 # Zoom added per second on still images
+KEN_BURNS_HEADROOM = 1.25 # Extra resolution kept above output size for the zoom
+INGEST_JPEG_QUALITY = 92 # Pre-sized still images written at fetch time
 DRY_RUN = False # Set to False to enable uploads (Default)
 
+# Render Profiles: scale the whole pipeline together.
+# scale: output resolution relative to LONG_VIDEO_SIZE / SHORTS_SIZE (also sizes captions and requested media)
+# caption_effects: stroke + drop shadow on caption glyphs
+RENDER_PROFILES = {
+    "draft": {"scale": 0.5, "fps": 15, "preset": "ultrafast", "crf": 32, "threads": 0, "caption_effects": False},
+    "preview": {"scale": 2 / 3, "fps": 24, "preset": "veryfast", "crf": 26, "threads": 0, "caption_effects": True},
+    "final": {"scale": 1.0, "fps": FPS, "preset": "veryfast", "crf": 20, "threads": 0, "caption_effects": True},
+}
+RENDER_PROFILE = os.getenv("RENDER_PROFILE", "final")
+
+# Voice
+TTS_MP3_BITRATE = 48000 # edge-tts default output (audio-24khz-48kbitrate-mono-mp3), bits/sec
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "6")) # edge-tts requests in flight across all sections
+VOICE_SAMPLE_RATE = 44100 # Voiceovers are assembled as PCM at this rate and written as wav
+TTS_MODE = os.getenv("TTS_MODE", "section") # "section": one request per section, pauses spliced in; "fragment": one per [pause]-split fragment
+TTS_CACHE_DIR = os.path.join(CACHE_DIR, "tts") # Synthesized fragments + word timestamps
+TTS_CACHE_BYTES = int(os.getenv("TTS_CACHE_BYTES", str(500 * 1024**2)))
+
+# Media fetching
+MEDIA_FETCH_WORKERS = int(os.getenv("MEDIA_FETCH_WORKERS", "4")) # Sections searched concurrently
+MEDIA_DOWNLOAD_WORKERS = int(os.getenv("MEDIA_DOWNLOAD_WORKERS", "8")) # Concurrent downloads across all sections
+PER_HOST_CONNECTIONS = int(os.getenv("PER_HOST_CONNECTIONS", "4")) # Max parallel requests to any one host
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024 # Bytes per read while streaming downloads
+DOWNLOAD_TIMEOUT = (10, 60) # (connect, read) seconds
+DOWNLOAD_RETRIES = 4
+DOWNLOAD_BACKOFF = 1.0 # Seconds before the first retry, doubled each time
+MEDIA_CACHE_DIR = os.path.join(CACHE_DIR, "media") # Downloaded media, content-addressed
+MEDIA_CACHE_BYTES = int(os.getenv("MEDIA_CACHE_BYTES", str(5 * 1024**3))) # LRU-evicted above this
+MEDIA_STAGING_MAX_AGE = 3 * 24 * 3600 # Abandoned .part/.lock files in the cache tmp dir are swept after this
+MEDIA_BANDWIDTH_BUDGET_MB = int(os.getenv("MEDIA_BANDWIDTH_BUDGET_MB", "600")) # Stock video download cap per run (cache hits are free)
+PEXELS_SEARCH_FACTOR = 3 # Search results fetched per video wanted, to choose by length/size
+STOCK_BITS_PER_PIXEL = 0.1 # Size estimate for renditions Pexels reports no size for
+SPEECH_WORDS_PER_SECOND = 2.5 # Section length estimate when the script has no duration_seconds
+WIKI_IMAGE_MIMES = ("image/jpeg", "image/png")
+WIKI_MAX_UPSCALE = 2.0 # Skip Wikimedia images that would need more than this to fill the frame (icons, flags)
+WIKI_MAX_IMAGE_BYTES = 8 * 1024 * 1024 # Never download originals bigger than this when a thumbnail exists
+QUERY_CACHE_TTL = { # Seconds a provider's search results are reused
+    "pexels": 7 * 24 * 3600,
+    "wikipedia": 30 * 24 * 3600,
+}
+
+# Rendering
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "moviepy") # "moviepy" (reference) or "ffmpeg" (filtergraph)
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+RENDER_PARALLEL = os.getenv("RENDER_PARALLEL", "0") == "1" # Render sections as separate segments in a process pool
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) # 0 = one per CPU core
+MUSIC_VOLUME = 0.1 # Music bed level before ducking, relative to MUSIC_REFERENCE_DBFS
+MUSIC_REFERENCE_DBFS = -20.0 # Tracks are gain-matched to this RMS level first
+MUSIC_CACHE_DIR = os.path.join(CACHE_DIR, "music") # Decoded, pre-analyzed music library (memory-mapped PCM)
+MIX_TARGET_LUFS = float(os.getenv("MIX_TARGET_LUFS", "-14")) # Integrated loudness of the final mix
+MIX_SAMPLE_RATE = 44100
+DUCK_THRESHOLD = 0.03 # Voice level (linear) above which music is pulled down
+DUCK_RATIO = 8
+DUCK_ATTACK_MS = 20
+DUCK_RELEASE_MS = 400
+USE_PROXIES = os.getenv("USE_PROXIES", "1") == "1" # Transcode stock footage to render size/fps right after download
+PROXY_CRF = 18 # All-intra proxies; keep close to visually lossless since they get re-encoded
+
@@ -1,35 +1,21 @@
-import wikipedia
+from app.content import wiki
 
 def fetch_wiki_data(query, sentences=5):
     """
     Fetches a summary from Wikipedia for the given query.
     """
     try:
-        # Search for the best match
-        search_results = wikipedia.search(query)
-        if not search_results:
+        # Best matching article (disambiguation pages are skipped)
+        page = wiki.best_page(query)
+        if not page:
             return None
-        
-        # Get the page of the first result
-        page = wikipedia.page(search_results[0], auto_suggest=False)
+
         return {
-            "title": page.title,
-            "summary": page.summary[:1000], # Limit length
-            "url": page.url,
-            "images": page.images[:5] # Get some image URLs for reference
+            "title": page["title"],
+            "summary": page["summary"][:1000], # Limit length
+            "url": page["url"],
+            "images": wiki.image_urls(wiki.page_images(page["title"]))[:5] # Get some image URLs for reference
         }
-    except wikipedia.exceptions.DisambiguationError as e:
-        # Pick the first option if ambiguous
-        try:
-             page = wikipedia.page(e.options[0], auto_suggest=False)
-             return {
-                "title": page.title,
-                "summary": page.summary[:1000],
-                "url": page.url,
-                 "images": page.images[:5]
-            }
-        except:
-            return None
     except Exception as e:
         print(f"Wikipedia fetch error for {query}: {e}")
         return None
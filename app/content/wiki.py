@@ -0,0 +1,102 @@
+"""
+Shared Wikipedia access layer for research and media fetching.
+Talks to the MediaWiki API directly over the pooled HTTP session so a page's
+images and their metadata come back in one batched request (the wikipedia
+package fetches them one round trip at a time). Every call goes through the
+query cache: memoized for the run, persisted with the "wikipedia" TTL and
+coalesced when identical requests overlap.
+"""
+from app.media.http import get_session, host_slot
+from app.media.query_cache import cached_query
+
+WIKI_API = "https://en.wikipedia.org/w/api.php"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+def api_get(params):
+    params = dict(params, action="query", format="json", formatversion=2)
+    with host_slot(WIKI_API):
+        response = get_session().get(WIKI_API, params=params, timeout=15)
+    response.raise_for_status()
+    return response.json()
+
+def search(query, limit=10):
+    """Page titles matching query, best first."""
+    def fetch():
+        data = api_get({"list": "search", "srsearch": query, "srlimit": limit, "srprop": ""})
+        return [hit["title"] for hit in data.get("query", {}).get("search", [])]
+    return cached_query("wikipedia", f"search|{limit}|{query}", fetch)
+
+def page(title):
+    """dict(title, url, summary, disambiguation) for a page title, or None if missing."""
+    def fetch():
+        data = api_get({
+            "titles": title, "redirects": 1,
+            "prop": "extracts|info|pageprops", "exintro": 1, "explaintext": 1,
+            "inprop": "url", "ppprop": "disambiguation",
+        })
+        pages = data.get("query", {}).get("pages", [])
+        if not pages or pages[0].get("missing"):
+            return None
+        p = pages[0]
+        return {
+            "title": p["title"],
+            "url": p.get("fullurl"),
+            "summary": p.get("extract", ""),
+            "disambiguation": "disambiguation" in p.get("pageprops", {}),
+        }
+    return cached_query("wikipedia", f"page|{title}", fetch)
+
+def page_images(title, thumb_width=None):
+    """
+    Every image on a page with its metadata, in one batched imageinfo query:
+    list of dict(title, url, width, height, size, mime). With thumb_width,
+    each also gets a server-scaled thumb_url/thumb_width/thumb_height
+    (the original, for images narrower than that).
+    """
+    def fetch():
+        images = []
+        params = {
+            "titles": title, "redirects": 1,
+            "generator": "images", "gimlimit": "max",
+            "prop": "imageinfo", "iiprop": "url|size|mime",
+        }
+        if thumb_width:
+            params["iiurlwidth"] = thumb_width
+        while True:
+            data = api_get(params)
+            for p in data.get("query", {}).get("pages", []):
+                info = (p.get("imageinfo") or [{}])[0]
+                if not info.get("url"):
+                    continue
+                image = {
+                    "title": p["title"],
+                    "url": info["url"],
+                    "width": info.get("width"),
+                    "height": info.get("height"),
+                    "size": info.get("size"),
+                    "mime": info.get("mime"),
+                }
+                if info.get("thumburl"):
+                    image.update(thumb_url=info["thumburl"], thumb_width=info.get("thumbwidth"), thumb_height=info.get("thumbheight"))
+                images.append(image)
+            if "continue" not in data:
+                break
+            params.update(data["continue"])
+        images.sort(key=lambda img: img["title"]) # Stable order across batches
+        return images
+    return cached_query("wikipedia", f"images|{thumb_width}|{title}", fetch)
+
+def best_page(query):
+    """First search hit for query that is a real article (skips disambiguation pages)."""
+    for title in search(query)[:3]:
+        p = page(title)
+        if p and not p["disambiguation"]:
+            return p
+    return None
+
+def image_urls(images):
+    """Photo URLs (jpg/png, no svg renders) from a page_images() list."""
+    return [
+        img["url"] for img in images
+        if img["url"].lower().endswith(IMAGE_EXTENSIONS) and 'svg' not in img["url"].lower()
+    ]
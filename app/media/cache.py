@@ -0,0 +1,197 @@
+"""
+Persistent content-addressed media cache.
+Files live under MEDIA_CACHE_DIR/<sha[:2]>/<sha><ext> and are indexed in the
+media_cache table by source key (the download URL, or URL plus a derivative
+tag for proxies). Runs hard-link cached files into their temp dir, so
+cleanup_run_artifacts never touches the cache. Inserts are atomic
+(os.replace within the cache dir) and the index is LRU-evicted down to
+MEDIA_CACHE_BYTES; abandoned staging files in tmp/ are swept at the same time.
+"""
+import os
+import shutil
+import hashlib
+import tempfile
+import time
+from datetime import datetime
+try:
+    import fcntl
+except ImportError: # Windows: no flock, every download stages privately
+    fcntl = None
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app.config import MEDIA_CACHE_DIR, MEDIA_CACHE_BYTES, MEDIA_STAGING_MAX_AGE
+from app.models import SessionLocal, MediaCacheEntry, ensure_tables
+
+def _session():
+    ensure_tables(MediaCacheEntry)
+    return SessionLocal()
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def staging_path(suffix=""):
+    """Temp file inside the cache dir, so the final os.replace stays on one filesystem."""
+    tmp_dir = os.path.join(MEDIA_CACHE_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=tmp_dir)
+    os.close(fd)
+    return path
+
+def staging_path_for(key, suffix=""):
+    """Deterministic temp path for key inside the cache dir (lets interrupted downloads resume)."""
+    tmp_dir = os.path.join(MEDIA_CACHE_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, hashlib.sha1(key.encode()).hexdigest() + suffix)
+
+def try_lock(path):
+    """
+    Non-blocking cross-process lock on <path>.lock (flock, released when the
+    holder exits). Returns the lock handle for unlock(), or None if another
+    process holds it.
+    """
+    if fcntl is None:
+        return None
+    lock_path = path + ".lock"
+    handle = open(lock_path, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # The previous holder unlinks the file on release: a lock on that old inode guards nothing
+        if os.fstat(handle.fileno()).st_ino != os.stat(lock_path).st_ino:
+            raise OSError("lock file replaced")
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+def unlock(handle):
+    """Releases a try_lock() lock and removes its lock file."""
+    if handle:
+        try:
+            os.remove(handle.name) # Before closing, so nobody can lock this inode afterwards
+        except OSError:
+            pass
+        handle.close() # Closing drops the flock
+
+def discard_staged(path):
+    """Removes a staged download and its partial data."""
+    for leftover in (path, path + ".part"):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+
+def sweep_staging(max_age=MEDIA_STAGING_MAX_AGE):
+    """Deletes abandoned files in the cache tmp dir (interrupted parts, stale locks) older than max_age."""
+    tmp_dir = os.path.join(MEDIA_CACHE_DIR, "tmp")
+    if not os.path.isdir(tmp_dir):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(tmp_dir):
+        path = os.path.join(tmp_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            continue
+
+def link_into(cache_path, dest_path):
+    """Hard-links a cache file to dest_path (copying across filesystems)."""
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    try:
+        os.link(cache_path, dest_path)
+    except OSError:
+        shutil.copy2(cache_path, dest_path)
+    return dest_path
+
+def lookup(key):
+    """Cached file path for key (and bumps its LRU time), or None."""
+    try:
+        db = _session()
+        try:
+            entry = db.query(MediaCacheEntry).filter_by(key=key).first()
+            if entry is None:
+                return None
+            if not os.path.exists(entry.path):
+                db.delete(entry)
+                db.commit()
+                return None
+            entry.last_used_at = datetime.utcnow()
+            db.commit()
+            return entry.path
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Media cache lookup failed (non-critical): {e}")
+        return None
+
+def store(key, src_path):
+    """
+    Moves src_path into the cache under key and returns the cached path.
+    Identical content fetched from different URLs is stored once.
+    On any failure the original src_path is returned untouched.
+    """
+    try:
+        sha = file_sha256(src_path)
+        ext = os.path.splitext(src_path)[1].lower()
+        cache_path = os.path.join(MEDIA_CACHE_DIR, sha[:2], sha + ext)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        if os.path.exists(cache_path):
+            os.remove(src_path)
+        else:
+            staged = staging_path(ext)
+            shutil.move(src_path, staged)
+            os.replace(staged, cache_path)
+
+        db = _session()
+        try:
+            entry = db.query(MediaCacheEntry).filter_by(key=key).first()
+            if entry is None:
+                entry = MediaCacheEntry(key=key)
+                db.add(entry)
+            entry.sha256 = sha
+            entry.path = cache_path
+            entry.size_bytes = os.path.getsize(cache_path)
+            entry.last_used_at = datetime.utcnow()
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another run inserted the same key meanwhile; its entry is just as good
+                db.rollback()
+        finally:
+            db.close()
+
+        evict()
+        return cache_path
+    except Exception as e:
+        print(f"Media cache store failed (non-critical): {e}")
+        return src_path if os.path.exists(src_path) else None
+
+def evict(budget=MEDIA_CACHE_BYTES):
+    """Drops least recently used entries until the cache's files fit in budget."""
+    sweep_staging()
+    db = _session()
+    try:
+        # Entries sharing a hash share one file: count each file once
+        files = db.query(MediaCacheEntry.sha256, func.max(MediaCacheEntry.size_bytes)).group_by(MediaCacheEntry.sha256).all()
+        total = sum(size for _, size in files)
+        if total <= budget:
+            return
+
+        for entry in db.query(MediaCacheEntry).order_by(MediaCacheEntry.last_used_at).all():
+            if total <= budget:
+                break
+            db.delete(entry)
+            db.flush()
+            still_used = db.query(MediaCacheEntry).filter_by(sha256=entry.sha256).count()
+            if not still_used:
+                if os.path.exists(entry.path):
+                    os.remove(entry.path) # Hard links in live run dirs keep their data
+                total -= entry.size_bytes
+        db.commit()
+        print(f"Media cache evicted down to {total / 1e6:.0f} MB")
+    finally:
+        db.close()
@@ -0,0 +1,96 @@
+"""
+Resumable HTTP downloader.
+Streams in large chunks to <dest>.part with connect/read timeouts, retries
+with exponential backoff and picks up where it stopped via HTTP Range.
+The .part file is only renamed onto dest once its size matches the
+server's Content-Length, so a truncated file is never mistaken for a
+finished one.
+"""
+import os
+import time
+from app.config import DOWNLOAD_CHUNK_SIZE, DOWNLOAD_TIMEOUT, DOWNLOAD_RETRIES, DOWNLOAD_BACKOFF
+from app.media.http import get_session, host_slot
+
+class DownloadError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self):
+        # Not found / forbidden won't get better; rate limits and 5xx might
+        return self.status is None or self.status in (408, 429) or self.status >= 500
+
+def expected_size(response, offset):
+    """Full file size from Content-Range (206) or Content-Length (200), or None."""
+    content_range = response.headers.get("Content-Range", "")
+    if response.status_code == 206 and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length) + (offset if response.status_code == 206 else 0)
+    return None
+
+def _attempt(url, part_path):
+    """One GET, resuming from whatever part_path already holds. Returns (bytes written, expected size)."""
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    # identity: Content-Length must describe the bytes we write
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+
+    with host_slot(url):
+        with get_session().get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status_code == 416:
+                # Range past the end: the part file already holds everything
+                return 0, offset
+            if response.status_code not in (200, 206):
+                raise DownloadError(f"HTTP {response.status_code}", response.status_code)
+            if response.status_code == 200:
+                offset = 0 # Server ignored Range: start over
+
+            total = expected_size(response, offset)
+            written = 0
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    written += len(chunk)
+            return written, total
+
+def download(url, dest_path, retries=DOWNLOAD_RETRIES):
+    """
+    Downloads url to dest_path. Returns dest_path; raises DownloadError when
+    every attempt failed (the .part file is kept for the next try).
+    """
+    part_path = dest_path + ".part"
+    start = time.time()
+    received = 0
+    last_error = None
+
+    for attempt in range(retries + 1):
+        if attempt:
+            delay = DOWNLOAD_BACKOFF * 2 ** (attempt - 1)
+            print(f"Retrying {url} in {delay:.0f}s ({last_error})")
+            time.sleep(delay)
+        try:
+            written, total = _attempt(url, part_path)
+            received += written
+            size = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if total is not None and size != total:
+                last_error = f"incomplete: {size}/{total} bytes"
+                if size > total:
+                    os.remove(part_path) # Stale part from a different file version
+                continue
+            os.replace(part_path, dest_path)
+            elapsed = max(time.time() - start, 1e-6)
+            print(f"Downloaded {os.path.basename(dest_path)}: {size / 1e6:.1f} MB in {elapsed:.1f}s ({received / elapsed / 1e6:.2f} MB/s)")
+            return dest_path
+        except DownloadError as e:
+            if not e.retryable:
+                raise
+            last_error = e
+        except Exception as e:
+            last_error = e
+
+    raise DownloadError(f"{url}: {last_error}")
@@ -1,124 +1,360 @@
-import requests
 import os
 import random
-import wikipedia
-from app.config import PEXELS_API_KEY, ASSETS_DIR
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import PEXELS_API_KEY, ASSETS_DIR, MEDIA_FETCH_WORKERS, MEDIA_DOWNLOAD_WORKERS
+from app.config import MEDIA_BANDWIDTH_BUDGET_MB, PEXELS_SEARCH_FACTOR, STOCK_BITS_PER_PIXEL, SPEECH_WORDS_PER_SECOND
+from app.config import WIKI_IMAGE_MIMES, WIKI_MAX_UPSCALE, WIKI_MAX_IMAGE_BYTES, KEN_BURNS_HEADROOM
+from app import config
+from app.video.profiles import get_render_profile, get_video_size
+from app.media.proxy import make_proxy, proxy_path
+from app.media.http import get_session, host_slot
+from app.media.downloader import download
+from app.media.ingest import ingest_image
+from app.media import cache as media_cache
+from app.media.query_cache import cached_query
+from app.content import wiki
+
+_url_locks = {}
+_url_locks_lock = threading.Lock()
+
+def url_lock(url):
+    with _url_locks_lock:
+        return _url_locks.setdefault(url, threading.Lock())
+
+def link_cached(key, path):
+    """Links the cached file for key to path. None on a miss, or if the file vanished meanwhile (evicted)."""
+    cached = media_cache.lookup(key)
+    if not cached:
+        return None
+    try:
+        return media_cache.link_into(cached, path)
+    except OSError as e:
+        print(f"Media cache link failed (non-critical): {e}")
+        return None
+
+def download_direct(url, path):
+    """Plain per-run download, bypassing the cache."""
+    try:
+        return download(url, path)
+    except Exception as e:
+        print(f"Error downloading {url}: {e}")
+        return None
 
 def download_file(url, folder, filename):
+    """
+    Downloads url to folder/filename, going through the shared media cache:
+    cached URLs are hard-linked in without touching the network. Cache
+    failures fall back to a direct download; returns None if that fails too.
+    """
     path = os.path.join(folder, filename)
     if os.path.exists(path):
         return path
-    
+
+    linked = link_cached(url, path)
+    if linked:
+        return linked
+
+    # Same URL requested by two sections at once: download it once
+    with url_lock(url):
+        linked = link_cached(url, path)
+        if linked:
+            return linked
+
+        # Stable staging name, so an interrupted download resumes next time.
+        # url_lock only covers this process: the flock keeps other runs off the same .part
+        ext = os.path.splitext(filename)[1]
+        try:
+            staged = media_cache.staging_path_for(url, ext)
+            lock = media_cache.try_lock(staged)
+            if lock is None:
+                staged = media_cache.staging_path(ext) # Held elsewhere: private, non-resumable part
+        except OSError as e:
+            print(f"Media cache unavailable (non-critical): {e}")
+            return download_direct(url, path)
+        try:
+            try:
+                download(url, staged)
+            except Exception as e:
+                print(f"Error downloading {url}: {e}")
+                # Keep a shared part only while a retry could still resume it
+                if lock is None or not getattr(e, "retryable", True):
+                    media_cache.discard_staged(staged)
+                return None
+            cached = media_cache.store(url, staged)
+        finally:
+            media_cache.unlock(lock)
+
     try:
-        response = requests.get(url, stream=True, headers={'User-Agent': 'EasyMotoBot/1.0'})
-        if response.status_code == 200:
-            with open(path, 'wb') as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
+        if cached == staged:
+            # Cache unavailable: keep the download for this run only
+            shutil.move(staged, path)
             return path
-    except Exception as e:
-        print(f"Error downloading {url}: {e}")
-    return None
+        if cached:
+            return media_cache.link_into(cached, path)
+    except OSError as e:
+        print(f"Media cache link failed (non-critical): {e}")
+    return download_direct(url, path)
+
+def cached_proxy(url, local_path, size, fps):
+    """Proxy for a downloaded clip, reused from the media cache across runs."""
+    key = f"{url}#proxy_{size[0]}x{size[1]}_{fps}"
+    dest = proxy_path(local_path, size, fps)
+    linked = link_cached(key, dest)
+    if linked:
+        return linked
+
+    out = make_proxy(local_path, size, fps)
+    if out == local_path:
+        return out # Transcode failed, original it is
+    cached = media_cache.store(key, out)
+    if cached and cached != out:
+        try:
+            media_cache.link_into(cached, dest)
+        except OSError as e:
+            print(f"Media cache link failed (non-critical): {e}, using original")
+            return local_path
+    return dest if os.path.exists(dest) else local_path
+
+def wiki_thumb_width(target_size):
+    """Thumbnail width that lets a typical 3:2 photo cover target_size with Ken Burns headroom."""
+    tw, th = target_size
+    return int(max(tw, th * 1.5) * KEN_BURNS_HEADROOM)
+
+def select_wiki_images(images, target_size, limit):
+    """
+    Picks photos from page_images() metadata before downloading anything:
+    jpeg/png only, no icons or images that would need more than
+    WIKI_MAX_UPSCALE to fill the frame, and the server-side thumbnail
+    instead of the original whenever the thumbnail is big enough.
+    """
+    tw, th = target_size
+    chosen = []
+    for img in images:
+        if len(chosen) >= limit:
+            break
+        if img.get("mime") not in WIKI_IMAGE_MIMES or 'svg' in img["url"].lower():
+            continue
+        w, h = img.get("width") or 0, img.get("height") or 0
+        if not w or not h or max(tw / w, th / h) > WIKI_MAX_UPSCALE:
+            continue
 
-def fetch_wikimedia_images(query, limit=5):
-    images = []
+        url = img["url"]
+        thumb_w, thumb_h = img.get("thumb_width") or 0, img.get("thumb_height") or 0
+        if img.get("thumb_url") and thumb_w >= tw and thumb_h >= th:
+            url = img["thumb_url"]
+        elif (img.get("size") or 0) > WIKI_MAX_IMAGE_BYTES and img.get("thumb_url"):
+            url = img["thumb_url"] # Slight upscale beats a 20+ MB original
+        chosen.append(url)
+    return chosen
+
+def fetch_wikimedia_images(query, limit=5, target_size=None):
     try:
-        results = wikipedia.search(query)
-        if results:
-            page = wikipedia.page(results[0], auto_suggest=False)
-            for img in page.images:
-                lower_img = img.lower()
-                if lower_img.endswith(('.jpg', '.jpeg', '.png')) and 'svg' not in lower_img:
-                    images.append(img)
-                    if len(images) >= limit: break
+        page = wiki.best_page(query)
+        if not page:
+            return []
+        if not target_size:
+            return wiki.image_urls(wiki.page_images(page["title"]))[:limit]
+        images = wiki.page_images(page["title"], wiki_thumb_width(target_size))
+        return select_wiki_images(images, target_size, limit)
     except Exception as e:
         print(f"Wikimedia fetch error: {e}")
-    return images
+        return []
+
+class BandwidthBudget:
+    """Bytes this run may still download from stock providers (shared across section threads)."""
+    def __init__(self, total_bytes):
+        self.remaining = total_bytes
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        with self._lock:
+            if nbytes > self.remaining:
+                return False
+            self.remaining -= nbytes
+            return True
+
+def estimate_section_duration(section):
+    """Seconds of screen time a section needs, before its voiceover exists."""
+    if section.get("duration_seconds"):
+        return float(section["duration_seconds"])
+    words = len(section.get("voiceover", section.get("text", "")).split())
+    return max(words / SPEECH_WORDS_PER_SECOND, 1.0)
+
+def estimate_bytes(video_file, duration):
+    """Pexels sometimes reports file size; otherwise estimate from pixels, fps and length."""
+    if video_file.get("size"):
+        return int(video_file["size"])
+    fps = video_file.get("fps") or 30
+    return int(video_file["width"] * video_file["height"] * fps * (duration or 10) * STOCK_BITS_PER_PIXEL / 8)
+
+def pick_video_file(files, target_size=None, target_fps=None):
+    """
+    Smallest mp4 rendition that still covers target_size (w, h) at close to
+    target_fps; the largest one if none does, or when no target is given.
+    """
+    files = [f for f in files if f.get("width") and f.get("height") and f.get("file_type", "video/mp4") == "video/mp4"]
+    if not files:
+        return None
+    files.sort(key=lambda x: (x["width"] * x["height"], x.get("fps") or 0))
+    if target_size:
+        tw, th = target_size
+        covering = [f for f in files if f["width"] >= tw and f["height"] >= th]
+        if target_fps:
+            # 29.97 covers 30; a 60 fps file is twice the bytes for frames we drop
+            covering = [f for f in covering if (f.get("fps") or target_fps) >= target_fps * 0.95] or covering
+        if covering:
+            return covering[0]
+    return files[-1]
+
+def select_videos(videos, limit, duration_min, target_size=None, target_fps=None, budget=None):
+    """
+    Picks up to `limit` (video, rendition) pairs: videos at least duration_min
+    long first (so the composer doesn't loop them), otherwise in API relevance
+    order, skipping whatever doesn't fit the bandwidth budget.
+    """
+    ranked = sorted(videos, key=lambda v: (v.get("duration") or 0) < duration_min)
+    chosen = []
+    for vid in ranked:
+        if len(chosen) >= limit:
+            break
+        best = pick_video_file(vid.get("video_files", []), target_size, target_fps)
+        if not best:
+            continue
+        if budget and not media_cache.lookup(best["link"]):
+            nbytes = estimate_bytes(best, vid.get("duration"))
+            if not budget.reserve(nbytes):
+                print(f"Skipping Pexels video {vid.get('id')}: {nbytes / 1e6:.0f} MB over this run's download budget")
+                continue
+        chosen.append(best["link"])
+    return chosen
 
-def fetch_stock_media(query, orientation="landscape", limit=3, duration_min=4):
+def fetch_stock_media(query, orientation="landscape", limit=3, duration_min=4, target_size=None, target_fps=None, budget=None):
     """
     Fetches video URLs from Pexels.
+    Searches a few extra results so there is a choice of clips long enough
+    for the section (duration_min) and renditions no bigger than target_size.
     """
     if not PEXELS_API_KEY:
         print("Pexels API Key missing.")
         return []
 
     headers = {"Authorization": PEXELS_API_KEY}
-    url = f"https://api.pexels.com/videos/search?query={query}&per_page={limit}&orientation={orientation}"
-    
-    try:
-        response = requests.get(url, headers=headers)
+    per_page = max(limit * PEXELS_SEARCH_FACTOR, limit)
+    url = f"https://api.pexels.com/videos/search?query={query}&per_page={per_page}&orientation={orientation}"
+
+    def search():
+        with host_slot(url):
+            response = get_session().get(url, headers=headers)
+        response.raise_for_status() # Rate limits / outages must not be cached
         data = response.json()
-        videos = []
-        for vid in data.get("videos", []):
-            files = vid.get("video_files", [])
-            files.sort(key=lambda x: x["width"], reverse=True)
-            if files:
-                videos.append(files[0]["link"])
-        return videos
+        # Only what rendition selection needs, to keep cache rows small
+        return {"videos": [
+            {
+                "id": vid.get("id"),
+                "duration": vid.get("duration"),
+                "video_files": [
+                    {k: f.get(k) for k in ("width", "height", "fps", "file_type", "size", "link")}
+                    for f in vid.get("video_files", [])
+                ],
+            }
+            for vid in data.get("videos", [])
+        ]}
+
+    try:
+        data = cached_query("pexels", f"{orientation}|{per_page}|{query}", search)
+        return select_videos(data.get("videos", []), limit, duration_min, target_size, target_fps, budget)
     except Exception as e:
         print(f"Error fetching Pexels media: {e}")
         return []
 
+def download_all(pool, jobs, temp_dir, target_size, proxy_size=None, fps=None):
+    """
+    Downloads (url, filename) jobs concurrently on the shared download pool.
+    Images are downscaled on ingest to target_size; videos go through the
+    proxy stage when proxy_size is given.
+    Returns the local paths that succeeded, in job order.
+    """
+    def fetch(url, filename):
+        lp = download_file(url, temp_dir, filename)
+        if not lp:
+            return None
+        if lp.endswith(".mp4"):
+            return cached_proxy(url, lp, proxy_size, fps) if proxy_size else lp
+        return ingest_image(lp, target_size)
+
+    futures = [pool.submit(fetch, url, filename) for url, filename in jobs]
+    return [lp for lp in (f.result() for f in futures) if lp]
+
+def fetch_section_media(i, section, temp_dir, orientation, target_size, profile, pool, budget):
+    keywords = section.get("visual_keywords", "motorbike")
+    proxy_size = target_size if config.USE_PROXIES else None
+
+    # 1. Wikimedia for specific parts/technical/bike name queries, searched alongside Pexels
+    is_technical = any(x in keywords.lower() for x in ['engine', 'meter', 'spec', 'brake', 'suspension', 'parts'])
+    with ThreadPoolExecutor(max_workers=2) as search:
+        wiki_search = search.submit(fetch_wikimedia_images, keywords, target_size=target_size) if is_technical else None
+        # 2. Pexels video. STRICT RULE: Prioritize specific matches.
+        # User Rule: "Better to use the images than to use random video. if the specific topic model video is not found, we can use the images and add zoomin effects there."
+        # This means: Don't fall back to "motorbike" videos if query is "Yamaha R15".
+        # We assume 'keywords' is the specific query from the prompt.
+        vid_search = search.submit(
+            fetch_stock_media, keywords, orientation=orientation, limit=2,
+            duration_min=estimate_section_duration(section), target_size=target_size,
+            target_fps=profile["fps"], budget=budget
+        )
+        wiki_urls = wiki_search.result() if wiki_search else []
+        vid_urls = vid_search.result()
+
+    saved_paths = download_all(
+        pool,
+        [(url, f"wiki_s{i}_{j}.jpg") for j, url in enumerate(wiki_urls)] +
+        [(url, f"pex_s{i}_{j}.mp4") for j, url in enumerate(vid_urls)],
+        temp_dir, target_size, proxy_size, profile["fps"]
+    )
+
+    # If we have NO media (images or videos) yet, OR only 1 video:
+    # Increase Wikimedia search aggressively.
+    if len(saved_paths) < 2:
+        print(f"Low media count for {keywords}, prioritizing images over random video.")
+        wiki_urls = fetch_wikimedia_images(keywords, limit=5, target_size=target_size)
+        saved_paths += download_all(pool, [(url, f"wiki_strict_s{i}_{j}.jpg") for j, url in enumerate(wiki_urls)], temp_dir, target_size)
+
+    # Fallback: If STILL empty, try Wikimedia purely for images once more.
+    # Stay strict: black screen or single image preferred over wrong video.
+    if not saved_paths:
+        print("No specific media found. Trying fallback to Wikimedia for keywords again.")
+        wiki_urls = fetch_wikimedia_images(keywords, target_size=target_size)
+        saved_paths += download_all(pool, [(url, f"fallback_wiki_s{i}_{j}.jpg") for j, url in enumerate(wiki_urls)], temp_dir, target_size)
+
+    return saved_paths
+
 def get_media_for_script(script_sections, run_id, script_type="long"):
-    media_map = {}
+    """
+    Fetches visuals for every section concurrently: sections run on a small
+    pool, their downloads share a bounded download pool and every request
+    respects the per-host connection limit. media_map comes back keyed by
+    section index, same as the sequential version.
+    """
     orientation = "portrait" if script_type == "shorts" else "landscape"
+    profile = get_render_profile()
+    target_size = get_video_size(script_type == "shorts", profile)
     
     # Create temp download dir for this run
     temp_dir = os.path.join(ASSETS_DIR, "temp_media", run_id)
     os.makedirs(temp_dir, exist_ok=True)
 
-    for i, section in enumerate(script_sections):
-        keywords = section.get("visual_keywords", "motorbike")
-        
-        saved_paths = []
-        
-        # 1. Try Wikimedia for specific parts/technical/bike name queries
-        is_technical = any(x in keywords.lower() for x in ['engine', 'meter', 'spec', 'brake', 'suspension', 'parts'])
-        if is_technical:
-            wiki_urls = fetch_wikimedia_images(keywords)
-            for j, url in enumerate(wiki_urls):
-                filename = f"wiki_s{i}_{j}.jpg"
-                lp = download_file(url, temp_dir, filename)
-                if lp: saved_paths.append(lp)
-        
-        # 2. Add Pexels video. STRICT RULE: Prioritize specific matches.
-        # User Rule: "Better to use the images than to use random video. if the specific topic model video is not found, we can use the images and add zoomin effects there."
-        # This means: Don't fall back to "motorbike" videos if query is "Yamaha R15".
-        
-        # We assume 'keywords' is the specific query from the prompt.
-        # Try fetching videos.
-        vid_urls = fetch_stock_media(keywords, orientation=orientation, limit=2)
-        
-        # If videos found, use them (assuming stock search returned decent matches for query)
-        for j, url in enumerate(vid_urls):
-            filename = f"pex_s{i}_{j}.mp4"
-            lp = download_file(url, temp_dir, filename)
-            if lp: saved_paths.append(lp)
-            
-        # If we have NO media (images or videos) yet, OR only 1 video:
-        # Increase Wikimedia search aggressively.
-        if len(saved_paths) < 2:
-            print(f"Low media count for {keywords}, prioritizing images over random video.")
-            wiki_urls = fetch_wikimedia_images(keywords, limit=5)
-            for j, url in enumerate(wiki_urls):
-                filename = f"wiki_strict_s{i}_{j}.jpg"
-                lp = download_file(url, temp_dir, filename)
-                if lp: saved_paths.append(lp)
-                
-        # Fallback: If STILL empty, check if we haven't tried Wikimedia yet (technical check skipped it earlier?)
-        # Just ensures we don't return empty list if possible.
-        if not saved_paths:
-             print("No specific media found. Trying split keywords.")
-             # Last ditch: Split keywords? No, stay strict. Black screen or single image preferred over wrong video.
-             pass
-             print("No specific media found. Trying fallback to Wikimedia for keywords again.")
-             wiki_urls = fetch_wikimedia_images(keywords) # Try again purely for images
-             for j, url in enumerate(wiki_urls):
-                 filename = f"fallback_wiki_s{i}_{j}.jpg"
-                 lp = download_file(url, temp_dir, filename)
-                 if lp: saved_paths.append(lp)
-                 
-        media_map[i] = saved_paths
-    
+    budget = BandwidthBudget(MEDIA_BANDWIDTH_BUDGET_MB * 1024 * 1024)
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=MEDIA_DOWNLOAD_WORKERS) as downloads:
+        with ThreadPoolExecutor(max_workers=MEDIA_FETCH_WORKERS) as sections:
+            futures = [
+                sections.submit(fetch_section_media, i, section, temp_dir, orientation, target_size, profile, downloads, budget)
+                for i, section in enumerate(script_sections)
+            ]
+            media_map = {i: future.result() for i, future in enumerate(futures)}
+
+    print(f"Fetched media for {len(media_map)} sections in {time.time() - start:.1f}s ({budget.remaining / 1e6:.0f} MB budget left)")
     return media_map
@@ -0,0 +1,28 @@
+import subprocess
+from app.config import FFMPEG_BINARY, FFPROBE_BINARY
+
+def run_ffmpeg(args, input_data=None):
+    """
+    Runs ffmpeg with the given arguments (overwriting outputs).
+    Raises CalledProcessError with ffmpeg's stderr attached on failure.
+    """
+    cmd = [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error"] + [str(a) for a in args]
+    return subprocess.run(cmd, check=True, input=input_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+def probe_duration(path):
+    """Container duration in seconds, via ffprobe."""
+    cmd = [
+        FFPROBE_BINARY, "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path
+    ]
+    out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+    return float(out.decode().strip())
+
+def describe_error(e):
+    """Readable message for a failed ffmpeg call."""
+    stderr = getattr(e, "stderr", None)
+    if stderr:
+        return stderr.decode(errors="replace").strip().splitlines()[-1]
+    return str(e)
@@ -0,0 +1,41 @@
+"""
+Shared HTTP plumbing for media fetching.
+One pooled requests.Session per thread (Sessions aren't guaranteed
+thread-safe) and a per-host semaphore so concurrent fetches don't open more
+than PER_HOST_CONNECTIONS connections to any one API or CDN.
+"""
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import PER_HOST_CONNECTIONS
+
+USER_AGENT = 'EasyMotoBot/1.0'
+
+_local = threading.local()
+_host_slots = {}
+_host_lock = threading.Lock()
+
+def get_session():
+    """This thread's keep-alive Session."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=PER_HOST_CONNECTIONS, pool_maxsize=PER_HOST_CONNECTIONS)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers['User-Agent'] = USER_AGENT
+        _local.session = session
+    return session
+
+@contextmanager
+def host_slot(url):
+    """Holds one of the PER_HOST_CONNECTIONS slots for the URL's host."""
+    host = urlparse(url).netloc or url
+    with _host_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(PER_HOST_CONNECTIONS)
+    with slot:
+        yield
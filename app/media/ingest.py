@@ -0,0 +1,64 @@
+"""
+Downscale-on-ingest for still images.
+Photos are decoded straight at reduced resolution (JPEG draft mode, or
+Image.reduce for other formats), EXIF-rotated and cut down to just above
+the output size with Ken Burns headroom, then saved as a compact JPEG next
+to the original. Renderers load that instead of a multi-megapixel photo.
+"""
+import os
+from PIL import Image, ImageOps
+from app.config import KEN_BURNS_HEADROOM, INGEST_JPEG_QUALITY
+
+# EXIF orientations that swap width and height
+_TRANSPOSED = (5, 6, 7, 8)
+
+def load_presized(image_path, size, headroom=KEN_BURNS_HEADROOM):
+    """
+    RGB image covering `size` times `headroom` (never upsampled), center-cropped
+    to the frame's aspect ratio. Decodes no more pixels than that needs.
+    """
+    target_w, target_h = int(size[0] * headroom), int(size[1] * headroom)
+    with Image.open(image_path) as src:
+        w, h = src.size
+        orientation = src.getexif().get(0x0112, 1)
+        if orientation in _TRANSPOSED:
+            w, h = h, w
+        cover = max(target_w / w, target_h / h)
+
+        # Decode-time reduction: draft() picks the largest 1/2, 1/4, 1/8 JPEG scale still >= the request
+        need = (int(src.size[0] * cover) + 1, int(src.size[1] * cover) + 1)
+        if src.format == "JPEG":
+            src.draft("RGB", need)
+        img = src.convert("RGB")
+        if src.format != "JPEG":
+            factor = int(min(img.size[0] / need[0], img.size[1] / need[1]))
+            if factor >= 2:
+                img = img.reduce(factor)
+        img = ImageOps.exif_transpose(img, in_place=False) if orientation != 1 else img
+
+    # Exact cover size (or the full image when it is smaller), cropped to the frame aspect
+    w, h = img.size
+    scale = min(1.0, max(target_w / w, target_h / h))
+    cw, ch = min(w, round(target_w / scale)), min(h, round(target_h / scale))
+    box = ((w - cw) / 2, (h - ch) / 2, (w + cw) / 2, (h + ch) / 2)
+    out_size = (max(1, round(cw * scale)), max(1, round(ch * scale)))
+    return img.resize(out_size, Image.LANCZOS, box=box)
+
+def ingest_path(image_path, size):
+    root, _ = os.path.splitext(image_path)
+    return f"{root}.ingest_{size[0]}x{size[1]}.jpg"
+
+def ingest_image(image_path, size):
+    """Pre-sized JPEG for image_path at render size `size`; the original if it can't be read."""
+    out_path = ingest_path(image_path, size)
+    if os.path.exists(out_path):
+        return out_path
+    try:
+        img = load_presized(image_path, size)
+        part_path = out_path + ".part"
+        img.save(part_path, "JPEG", quality=INGEST_JPEG_QUALITY)
+        os.replace(part_path, out_path)
+    except Exception as e:
+        print(f"Image ingest failed for {image_path}: {e}, using original")
+        return image_path
+    return out_path
@@ -0,0 +1,196 @@
+"""
+Pre-analyzed background music library.
+Each track in MUSIC_DIR is decoded once into MUSIC_CACHE_DIR as raw
+interleaved float32 PCM (<key>.f32) plus <key>.json with its duration,
+RMS loudness and loop points. Renders memory-map the PCM read-only, so
+taking a slice costs no decoding and concurrent renders share the same
+pages through the OS page cache. Entries are keyed by file name, size and
+mtime, so replacing a track re-analyzes it.
+"""
+import os
+import json
+import random
+import hashlib
+import threading
+import numpy as np
+from app.config import MUSIC_DIR, MUSIC_CACHE_DIR, MIX_SAMPLE_RATE, MUSIC_REFERENCE_DBFS
+from app.media.ffmpeg_tools import run_ffmpeg
+
+INDEX_VERSION = 1 # Bump when the analysis or the PCM layout changes
+CHANNELS = 2
+SILENCE_DBFS = -50 # Leading/trailing audio below this is trimmed from the loop
+LOOP_MATCH_SECONDS = 0.25 # Window of the loop start matched against the tail
+LOOP_SEARCH_SECONDS = 8.0 # How far back from the end a loop point is searched
+LOOP_MIN_SCORE = 0.5 # Below this correlation the track just crossfades end into start
+CROSSFADE_SECONDS = 0.05
+
+_lock = threading.Lock()
+_index = None
+_maps = {}
+
+def track_key(path):
+    stat = os.stat(path)
+    payload = f"{INDEX_VERSION}|{os.path.basename(path)}|{stat.st_size}|{int(stat.st_mtime)}|{MIX_SAMPLE_RATE}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+def entry_paths(key):
+    return os.path.join(MUSIC_CACHE_DIR, key + ".f32"), os.path.join(MUSIC_CACHE_DIR, key + ".json")
+
+def rms_dbfs(samples):
+    rms = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64)))) if len(samples) else 0.0
+    return 20 * np.log10(max(rms, 1e-9))
+
+def audible_span(mono, sr):
+    """(first, last) sample of the audio above SILENCE_DBFS, in 10 ms blocks."""
+    block = sr // 100
+    usable = len(mono) // block * block
+    if not usable:
+        return 0, len(mono)
+    levels = np.sqrt(np.mean(np.square(mono[:usable].reshape(-1, block)), axis=1))
+    loud = np.nonzero(levels > 10 ** (SILENCE_DBFS / 20))[0]
+    if not len(loud):
+        return 0, len(mono)
+    return int(loud[0] * block), int(min(len(mono), (loud[-1] + 1) * block))
+
+def find_loop(mono, sr):
+    """
+    (loop_start, loop_end, score): the tail offset whose waveform best matches
+    the audio at loop_start, by normalized cross-correlation, so playback can
+    jump from loop_end back to loop_start without a seam.
+    """
+    start, end = audible_span(mono, sr)
+    window = int(LOOP_MATCH_SECONDS * sr)
+    search = min(int(LOOP_SEARCH_SECONDS * sr), (end - start) // 2)
+    if search <= window:
+        return start, end, 0.0
+
+    head = mono[start:start + window].astype(np.float64)
+    region = mono[end - search:end].astype(np.float64)
+    n = 1 << int(np.ceil(np.log2(len(region) + window)))
+    corr = np.fft.irfft(np.fft.rfft(region, n) * np.conj(np.fft.rfft(head, n)), n)[:len(region) - window + 1]
+    energy = np.cumsum(np.concatenate(([0.0], region ** 2)))
+    window_energy = energy[window:] - energy[:-window]
+    score = corr / np.sqrt(np.maximum(window_energy * np.sum(head ** 2), 1e-12))
+
+    best = int(np.argmax(score))
+    if score[best] < LOOP_MIN_SCORE:
+        return start, end, float(score[best])
+    return start, end - search + best, float(score[best])
+
+def analyze(path):
+    """Decodes one track into the cache. Returns its metadata."""
+    key = track_key(path)
+    pcm_path, meta_path = entry_paths(key)
+    sr = MIX_SAMPLE_RATE
+
+    out = run_ffmpeg(["-i", path, "-vn", "-f", "f32le", "-ac", CHANNELS, "-ar", sr, "-"]).stdout
+    samples = np.frombuffer(out, dtype=np.float32).reshape(-1, CHANNELS)
+    mono = samples.mean(axis=1)
+    loop_start, loop_end, score = find_loop(mono, sr)
+
+    os.makedirs(MUSIC_CACHE_DIR, exist_ok=True)
+    with open(pcm_path + ".part", "wb") as f:
+        f.write(out)
+    os.replace(pcm_path + ".part", pcm_path)
+    meta = {
+        "key": key,
+        "source": os.path.basename(path),
+        "sample_rate": sr,
+        "channels": CHANNELS,
+        "frames": len(samples),
+        "duration": len(samples) / sr,
+        "rms_dbfs": round(rms_dbfs(mono[loop_start:loop_end]), 2),
+        "loop_start": loop_start,
+        "loop_end": loop_end,
+        "loop_score": round(score, 3),
+    }
+    # Metadata last: a .json only exists next to a complete .f32
+    with open(meta_path + ".part", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".part", meta_path)
+    print(f"Analyzed music {meta['source']}: {meta['duration']:.1f}s, {meta['rms_dbfs']} dBFS, loop score {score:.2f}")
+    return meta
+
+def load_entry(path):
+    try:
+        with open(entry_paths(track_key(path))[1], encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def build_index(music_dir=MUSIC_DIR):
+    """Analyzes new or changed tracks in music_dir. Returns the list of track metadata."""
+    if not os.path.exists(music_dir):
+        return []
+    tracks = []
+    for name in sorted(os.listdir(music_dir)):
+        if not name.endswith('.mp3'):
+            continue
+        path = os.path.join(music_dir, name)
+        meta = load_entry(path)
+        if meta is None:
+            try:
+                meta = analyze(path)
+            except Exception as e:
+                print(f"Music analysis failed for {name} (non-critical): {e}")
+                continue
+        tracks.append(meta)
+    return tracks
+
+def get_index():
+    """Track metadata for the music folder, built once per process."""
+    global _index
+    with _lock:
+        if _index is None:
+            _index = build_index()
+        return _index
+
+def pick_track():
+    """Random analyzed track, or None when the music folder is empty."""
+    tracks = get_index()
+    print(f"Found {len(tracks)} music tracks.")
+    return random.choice(tracks) if tracks else None
+
+def track_samples(track):
+    """Read-only (frames, channels) float32 memmap of a track's PCM, opened once per process."""
+    with _lock:
+        samples = _maps.get(track["key"])
+        if samples is None:
+            pcm_path = entry_paths(track["key"])[0]
+            samples = np.memmap(pcm_path, dtype=np.float32, mode="r", shape=(track["frames"], track["channels"]))
+            _maps[track["key"]] = samples
+        return samples
+
+def track_gain(track):
+    """Linear gain bringing the track's loop to MUSIC_REFERENCE_DBFS."""
+    return 10 ** ((MUSIC_REFERENCE_DBFS - track["rms_dbfs"]) / 20)
+
+def music_slice(track, duration):
+    """
+    Exactly `duration` seconds of the track as (frames, channels) float32:
+    the intro once, then [loop_start, loop_end) repeated with a short
+    crossfade at each seam. A plain view of the memmap when no loop is needed.
+    """
+    samples = track_samples(track)
+    frames = int(round(duration * track["sample_rate"]))
+    loop_start, loop_end = track["loop_start"], track["loop_end"]
+    if frames <= loop_end:
+        return samples[:frames]
+
+    fade = min(int(CROSSFADE_SECONDS * track["sample_rate"]), (loop_end - loop_start) // 2)
+    ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)[:, None]
+    body = np.array(samples[loop_start:loop_end])
+    if fade:
+        # Each repeat fades from what would have followed loop_end into loop_start
+        tail = samples[loop_end:loop_end + fade]
+        if len(tail) == fade:
+            body[:fade] = body[:fade] * ramp + tail * (1 - ramp)
+
+    out = np.empty((frames, track["channels"]), dtype=np.float32)
+    out[:loop_end] = samples[:loop_end]
+    position = loop_end
+    while position < frames:
+        n = min(len(body), frames - position)
+        out[position:position + n] = body[:n]
+        position += n
+    return out
@@ -0,0 +1,46 @@
+"""
+Proxy transcoding for downloaded stock footage.
+Each clip is transcoded once, right after download, to the exact render size
+and fps (scale-to-fill and crop baked in, audio dropped) as all-intra H.264,
+so the composer reads frames that need no resizing and decode cheaply even
+when seeking or looping.
+"""
+import os
+from app.config import PROXY_CRF
+from app.media.ffmpeg_tools import run_ffmpeg, describe_error
+
+def proxy_path(src_path, size, fps):
+    root, _ = os.path.splitext(src_path)
+    return f"{root}.proxy_{size[0]}x{size[1]}_{fps}.mp4"
+
+def make_proxy(src_path, size, fps):
+    """
+    Returns the path of a size/fps proxy for src_path, creating it if needed.
+    Falls back to the original file if transcoding fails.
+    """
+    out_path = proxy_path(src_path, size, fps)
+    if os.path.exists(out_path):
+        return out_path
+
+    w, h = size
+    part_path = out_path + ".part.mp4"
+    try:
+        run_ffmpeg([
+            "-i", src_path,
+            "-an",
+            "-vf", f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h},fps={fps},setsar=1",
+            "-c:v", "libx264", "-preset", "ultrafast", "-tune", "fastdecode",
+            "-crf", PROXY_CRF, "-g", "1", "-pix_fmt", "yuv420p",
+            part_path
+        ])
+        os.replace(part_path, out_path)
+    except Exception as e:
+        print(f"Proxy transcode failed for {src_path}: {describe_error(e)}, using original")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return src_path
+
+    src_mb = os.path.getsize(src_path) / 1e6
+    out_mb = os.path.getsize(out_path) / 1e6
+    print(f"Proxy: {os.path.basename(src_path)} ({src_mb:.1f} MB) -> {w}x{h}@{fps} ({out_mb:.1f} MB)")
+    return out_path
@@ -0,0 +1,88 @@
+"""
+Search-result cache for media provider APIs.
+Results are kept in the query_cache table with a per-provider TTL
+(QUERY_CACHE_TTL), plus an in-process layer that also collapses identical
+queries issued concurrently into a single request.
+"""
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import Future
+from sqlalchemy.exc import IntegrityError
+from app.config import QUERY_CACHE_TTL
+from app.models import SessionLocal, QueryCacheEntry, ensure_tables
+
+_memo = {}
+_inflight = {}
+_lock = threading.Lock()
+
+def cache_key(provider, query):
+    return f"{provider}:{' '.join(str(query).lower().split())}"
+
+def _load(key):
+    try:
+        ensure_tables(QueryCacheEntry)
+        db = SessionLocal()
+        try:
+            entry = db.query(QueryCacheEntry).filter_by(key=key).first()
+            if entry and entry.expires_at > datetime.utcnow():
+                return True, entry.result
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Query cache read failed (non-critical): {e}")
+    return False, None
+
+def _save(key, provider, result):
+    try:
+        ensure_tables(QueryCacheEntry)
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            entry = db.query(QueryCacheEntry).filter_by(key=key).first()
+            if entry is None:
+                entry = QueryCacheEntry(key=key, provider=provider)
+                db.add(entry)
+            entry.result = result
+            entry.fetched_at = now
+            entry.expires_at = now + timedelta(seconds=QUERY_CACHE_TTL.get(provider, 0))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback() # Saved by a concurrent run
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"Query cache write failed (non-critical): {e}")
+
+def cached_query(provider, query, fetch):
+    """
+    Returns fetch()'s (JSON-serializable) result for query, from cache when fresh.
+    fetch should raise on transient failures so they aren't cached.
+    """
+    key = cache_key(provider, query)
+    with _lock:
+        if key in _memo:
+            return _memo[key]
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+
+    if not owner:
+        return future.result()
+
+    try:
+        hit, result = _load(key)
+        if not hit:
+            result = fetch()
+            _save(key, provider, result)
+        with _lock:
+            _memo[key] = result
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
@@ -0,0 +1,91 @@
+"""
+Persistent TTS cache.
+Each synthesized fragment is stored under TTS_CACHE_DIR as <key>.mp3 plus
+<key>.json (duration and word boundaries), keyed by voice, normalized text
+and synthesis parameters. The .json is written last, so only complete
+entries are ever read. Oldest-used entries are evicted above TTS_CACHE_BYTES.
+"""
+import os
+import json
+import shutil
+import hashlib
+from app.config import TTS_CACHE_DIR, TTS_CACHE_BYTES, TTS_MP3_BITRATE
+
+CACHE_VERSION = 1 # Bump when synthesis output changes shape
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+def cache_key(voice, text, **params):
+    payload = json.dumps({
+        "v": CACHE_VERSION,
+        "voice": voice,
+        "text": normalize_text(text),
+        "bitrate": TTS_MP3_BITRATE,
+        "params": params,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def entry_paths(key):
+    folder = os.path.join(TTS_CACHE_DIR, key[:2])
+    return os.path.join(folder, key + ".mp3"), os.path.join(folder, key + ".json")
+
+def load(key, out_path):
+    """Copies a cached fragment to out_path. Returns (duration, words) or None on a miss."""
+    audio_path, meta_path = entry_paths(key)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        try:
+            os.link(audio_path, out_path)
+        except OSError:
+            shutil.copyfile(audio_path, out_path)
+        os.utime(meta_path) # LRU by mtime
+        return meta["duration"], meta["words"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def save(key, audio_src, duration, words):
+    """Stores a synthesized fragment (audio_src is copied, not moved)."""
+    audio_path, meta_path = entry_paths(key)
+    try:
+        os.makedirs(os.path.dirname(audio_path), exist_ok=True)
+        shutil.copyfile(audio_src, audio_path + ".part")
+        os.replace(audio_path + ".part", audio_path)
+        with open(meta_path + ".part", "w", encoding="utf-8") as f:
+            json.dump({"duration": duration, "words": words}, f)
+        os.replace(meta_path + ".part", meta_path)
+    except OSError as e:
+        print(f"TTS cache write failed (non-critical): {e}")
+
+def evict(budget=TTS_CACHE_BYTES):
+    """Removes least recently used entries until the cache fits in budget."""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(TTS_CACHE_DIR):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(root, name)
+            audio_path = meta_path[:-len(".json")] + ".mp3"
+            try:
+                size = os.path.getsize(audio_path) + os.path.getsize(meta_path)
+                entries.append((os.path.getmtime(meta_path), size, meta_path, audio_path))
+                total += size
+            except OSError:
+                continue
+    if total <= budget:
+        return
+
+    for _, size, meta_path, audio_path in sorted(entries):
+        if total <= budget:
+            break
+        for path in (meta_path, audio_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+    print(f"TTS cache evicted down to {total / 1e6:.0f} MB")
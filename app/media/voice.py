@@ -2,8 +2,9 @@ import edge_tts
 import asyncio
 import os
 import re
-import subprocess
-from app.config import ASSETS_DIR
+from app.config import ASSETS_DIR, TTS_MP3_BITRATE, TTS_CONCURRENCY, TTS_MODE, VOICE_SAMPLE_RATE
+from app.media import tts_cache
+from app.media.ffmpeg_tools import run_ffmpeg
 
 # Voice Profiles
 VOICE_PROFILES = {
@@ -12,8 +13,6 @@ VOICE_PROFILES = {
     "brand": "en-US-GuyNeural"
 }
 
-from moviepy.editor import concatenate_audioclips, AudioFileClip
-from moviepy.audio.AudioClip import AudioArrayClip
 import numpy as np
 
 def clean_text(text):
@@ -38,171 +37,287 @@ def clean_text(text):
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-async def generate_segment(text, voice, out_path):
-    communicate = edge_tts.Communicate(text, voice)
-    await communicate.save(out_path)
-    return out_path
+def new_communicate(text, voice):
+    # edge-tts >= 7 only reports sentence boundaries unless asked for words
+    try:
+        return edge_tts.Communicate(text, voice, boundary="WordBoundary")
+    except TypeError:
+        return edge_tts.Communicate(text, voice)
 
-async def generate_voiceover(text, output_file, script_type="long"):
+async def synthesize(text, voice, out_path):
     """
-    Generates mp3 by chunking text at [pause] markers.
+    One streaming TTS request: writes the mp3 and collects word boundaries
+    in the same pass.
+    Returns (duration in seconds, [{word, start, end}] relative to the fragment).
     """
-    text = clean_text(text)
-    voice = VOICE_PROFILES.get(script_type, VOICE_PROFILES["long"])
-    
-    # Define pauses
-    pause_map = {
-        "[pause]": 0.6,
-        "[short pause]": 0.3,
-        "[long pause]": 1.2
-    }
-    
-    # Split text logic
-    # Regex split keeping delimiters?
-    # pattern = r'(\[pause\]|\[short pause\]|\[long pause\])'
+    words = []
+    audio_bytes = 0
+    with open(out_path, "wb") as f:
+        async for chunk in new_communicate(text, voice).stream():
+            if chunk["type"] == "audio":
+                f.write(chunk["data"])
+                audio_bytes += len(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                start = chunk["offset"] / 10_000_000
+                duration = chunk["duration"] / 10_000_000
+                words.append({"word": chunk["text"], "start": start, "end": start + duration})
+
+    # edge-tts streams constant-bitrate mp3, so the length follows from the byte count
+    duration = audio_bytes * 8 / TTS_MP3_BITRATE
+    if words:
+        duration = max(duration, words[-1]["end"])
+    return duration, words
+
+# Warmth (100Hz +3dB), presence (8kHz +2dB), then a limiter
+VOICE_POLISH_FILTER = "equalizer=f=100:t=q:w=1:g=3,equalizer=f=8000:t=q:w=1:g=2,alimiter=limit=0.9:attack=5:release=50"
+
+# Define pauses
+PAUSE_MAP = {
+    "[pause]": 0.6,
+    "[short pause]": 0.3,
+    "[long pause]": 1.2
+}
+
+def split_fragments(text):
+    """Cleaned text split at [pause] markers, pause tokens kept as their own parts."""
     pattern = re.compile(r'(\[.*?pause\])')
-    parts = pattern.split(text)
-    
-    audio_clips = []
-    temp_files = []
-    
-    base_name = output_file.replace(".mp3", "")
-    
-    import numpy as np
-    
-    current_time_offset = 0.0
+    return [part.strip() for part in pattern.split(clean_text(text)) if part.strip()]
+
+_pending = {} # cache key -> Event set once that fragment is in the cache
+
+async def synthesize_limited(text, voice, out_path, semaphore=None):
+    """
+    synthesize() through the TTS cache; only cache misses take a concurrency
+    slot, and identical fragments in flight at once are requested only once.
+    """
+    key = tts_cache.cache_key(voice, text)
+    hit = tts_cache.load(key, out_path)
+    if hit:
+        return hit
+
+    if key in _pending:
+        await _pending[key].wait()
+        hit = tts_cache.load(key, out_path)
+        if hit:
+            return hit
+
+    done = _pending.setdefault(key, asyncio.Event())
+    try:
+        if semaphore is None:
+            result = await synthesize(text, voice, out_path)
+        else:
+            async with semaphore:
+                result = await synthesize(text, voice, out_path)
+        tts_cache.save(key, out_path, *result)
+        return result
+    finally:
+        if _pending.get(key) is done:
+            del _pending[key]
+        done.set()
+
+def alnum_length(text):
+    return sum(1 for ch in text if ch.isalnum())
+
+def pause_cut_times(fragments, words):
+    """
+    Where each fragment boundary falls in a one-request synthesis of
+    " ".join(fragments): the middle of the gap between the last word of one
+    fragment and the first word of the next. Words are matched to fragments
+    by counting alphanumeric characters, so tokenization differences don't
+    matter. Returns None if the boundaries can't be matched exactly.
+    """
+    targets = []
+    total = 0
+    for fragment in fragments[:-1]:
+        total += alnum_length(fragment)
+        targets.append(total)
+
+    cuts = []
+    consumed = 0
+    for i, w in enumerate(words):
+        consumed += alnum_length(w["word"])
+        if targets and consumed == targets[0]:
+            if i + 1 >= len(words):
+                return None
+            cuts.append((w["end"] + words[i + 1]["start"]) / 2)
+            targets.pop(0)
+        elif targets and consumed > targets[0]:
+            return None
+    return cuts if not targets else None
+
+def decode_pcm(path):
+    """Mono float32 samples at VOICE_SAMPLE_RATE, decoded by one ffmpeg call."""
+    out = run_ffmpeg(["-i", path, "-f", "f32le", "-ac", "1", "-ar", VOICE_SAMPLE_RATE, "-"]).stdout
+    return np.frombuffer(out, dtype=np.float32)
+
+def assemble_voiceover(pieces, output_file):
+    """
+    Joins synthesized pieces in order and offsets their word timestamps.
+    pieces: ("pause", seconds) or ("speech", path, text, start, end, words),
+    where [start, end) is the span of the audio file to use (end None = to
+    the end of the file) and words are relative to the file.
+    Each source is decoded to PCM once, pauses are zero arrays, and the EQ +
+    limiter polish runs in the single encode to a lossless wav.
+    Returns the global word timestamps.
+    """
+    sr = VOICE_SAMPLE_RATE
+    sources = {}
+    chunks = []
+    position = 0 # samples written so far
     all_word_timestamps = []
-    
+
+    for piece in pieces:
+        if piece[0] == "pause":
+            # Silence for the pause
+            silence = np.zeros(int(round(piece[1] * sr)), dtype=np.float32)
+            chunks.append(silence)
+            position += len(silence)
+            continue
+
+        _, seg_path, part, start, end, seg_words = piece
+        if seg_path not in sources:
+            sources[seg_path] = decode_pcm(seg_path)
+        source = sources[seg_path]
+        first = min(int(round(start * sr)), len(source))
+        last = len(source) if end is None else min(int(round(end * sr)), len(source))
+        chunks.append(source[first:last])
+
+        current_time_offset = position / sr
+        shift = current_time_offset - first / sr
+        seg_timestamps = [
+            {"word": w["word"], "start": w["start"] + shift, "end": w["end"] + shift}
+            for w in seg_words
+        ]
+
+        # Fallback: If no timestamps found (e.g. WordBoundary missing), use estimation
+        if not seg_timestamps:
+            words = part.split()
+            if words:
+                time_per_word = (last - first) / sr / len(words)
+                for w_idx, w in enumerate(words):
+                    s = current_time_offset + (w_idx * time_per_word)
+                    e = s + time_per_word
+                    seg_timestamps.append({
+                        "word": w,
+                        "start": s,
+                        "end": e
+                    })
+
+        all_word_timestamps.extend(seg_timestamps)
+        position += last - first
+
+    pcm = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    polish_and_encode(pcm, output_file)
+    return all_word_timestamps
+
+async def section_pieces(parts, voice, base_name, semaphore, temp_files):
+    """
+    One TTS request for all spoken parts; pauses are spliced in at the word
+    boundaries between them. Returns None when they can't be located.
+    """
+    spoken = [part for part in parts if part not in PAUSE_MAP]
+    seg_path = f"{base_name}_spoken.mp3"
+    temp_files.append(seg_path)
+    duration, words = await synthesize_limited(" ".join(spoken), voice, seg_path, semaphore)
+
+    cuts = pause_cut_times(spoken, words)
+    if cuts is None:
+        print("Could not place pauses from word boundaries, synthesizing per fragment.")
+        return None
+
+    pieces = []
+    bounds = [0.0] + cuts + [duration]
+    spoken_idx = 0
+    for part in parts:
+        if part in PAUSE_MAP:
+            pieces.append(("pause", PAUSE_MAP[part]))
+            continue
+        start, end = bounds[spoken_idx], bounds[spoken_idx + 1]
+        if spoken_idx == len(spoken) - 1:
+            end = None # Keep the tail, however long the decoded file really is
+        part_words = [w for w in words if start <= w["start"] and (end is None or w["start"] < end)]
+        pieces.append(("speech", seg_path, part, start, end, part_words))
+        spoken_idx += 1
+    return pieces
+
+async def fragment_pieces(parts, voice, base_name, semaphore, temp_files):
+    """One TTS request per spoken part, all in flight at once."""
+    speech = {
+        i: (f"{base_name}_part{i}.mp3", part)
+        for i, part in enumerate(parts) if part not in PAUSE_MAP
+    }
+    temp_files.extend(seg_path for seg_path, _ in speech.values())
+    results = await asyncio.gather(*[
+        synthesize_limited(part, voice, seg_path, semaphore) for seg_path, part in speech.values()
+    ], return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    synthesized = dict(zip(speech, results))
+
+    pieces = []
     for i, part in enumerate(parts):
-        part = part.strip()
-        if not part: continue
-        
-        if part in pause_map:
-            # It's a pause
-            duration = pause_map[part]
-            # Create silence
-            # AudioArrayClip needs numpy array
-            # silence = AudioArrayClip(np.zeros((int(44100 * duration), 2)), fps=44100)
-            # Actually simpler: make a silent clip using a function?
-            # Or just use AudioClip(lambda t: [0,0], duration=duration)
-            from moviepy.audio.AudioClip import AudioClip
-            silence = AudioClip(lambda t: [0,0], duration=duration, fps=44100)
-            audio_clips.append(silence)
-            current_time_offset += duration
+        if part in PAUSE_MAP:
+            pieces.append(("pause", PAUSE_MAP[part]))
         else:
-            # It's text
-            # Generate audio
-            seg_path = f"{base_name}_part{i}.mp3"
-            await generate_segment(part, voice, seg_path)
-            temp_files.append(seg_path)
-            
-            if os.path.exists(seg_path):
-                clip = AudioFileClip(seg_path)
-                audio_clips.append(clip)
-                
-                # We need word timestamps for this segment?
-                # edge_tts word boundary extraction is hard if we just saved to file.
-                # To get timestamps, we need to stream it.
-                # Redo generate_segment logic to parse stream?
-                # Yes.
-                
-                # Re-run communicate to get timings? Or do it in one pass?
-                # Doing it in one pass is better.
-                # Let's refactor loop to use stream for text parts.
-                
-                # BUT wait, we need to save the file to load into MoviePy?
-                # Yes.
-                
-                # Refined loop block for text:
-                seg_timestamps = []
-                communicate = edge_tts.Communicate(part, voice)
-                with open(seg_path, "wb") as f:
-                    async for chunk in communicate.stream():
-                        if chunk["type"] == "audio":
-                            f.write(chunk["data"])
-                        elif chunk["type"] == "WordBoundary":
-                            start = chunk["offset"] / 10_000_000
-                            duration = chunk["duration"] / 10_000_000
-                            seg_timestamps.append({
-                                "word": chunk["text"],
-                                "start": start + current_time_offset,
-                                "end": start + duration + current_time_offset
-                            })
-                
-                # Fallback: If no timestamps found (e.g. WordBoundary missing), use estimation
-                if not seg_timestamps:
-                    words = part.split()
-                    if words:
-                        # Use actual clip duration from file
-                        # Reload clip to get accurate audio duration (ffmpeg/moviepy)
-                        # We already loaded 'clip' above but didn't use it yet for duration in this scope
-                        # Wait, we loaded 'clip' at line 100.
-                        seg_duration = clip.duration
-                        time_per_word = seg_duration / len(words)
-                        for w_idx, w in enumerate(words):
-                            s = current_time_offset + (w_idx * time_per_word)
-                            e = s + time_per_word
-                            seg_timestamps.append({
-                                "word": w,
-                                "start": s,
-                                "end": e
-                            })
-                
-                all_word_timestamps.extend(seg_timestamps)
-                
-                # clip duration
-                # Reload clip to be sure of duration (already loaded as 'clip')
-                # Use clip.duration for offset correctness
-                current_time_offset += clip.duration
-    
-    # Concatenate
-    if audio_clips:
-        final_clip = concatenate_audioclips(audio_clips)
-        final_clip.write_audiofile(output_file, logger=None)
-        final_clip.close()
-        for c in audio_clips:
-            c.close() 
-    else:
-        # Create empty file?
-        pass
-
-    # Cleanup temp
-    for f in temp_files:
-        try:
-            os.remove(f)
-        except:
-            pass
-
-    # Post Processing
-    polish_audio(output_file)
-    
-    return output_file, all_word_timestamps
+            seg_path, _ = speech[i]
+            seg_duration, seg_words = synthesized[i]
+            pieces.append(("speech", seg_path, part, 0.0, None, seg_words))
+    return pieces
 
-def polish_audio(input_path):
+async def generate_voiceover(text, output_file, script_type="long", semaphore=None):
     """
-    Applies EQ and Compression using FFMPEG.
-    Overwrites input file or creates temp? Let's overwrite safely.
+    Generates the voiceover wav from text with [pause] markers.
+    TTS_MODE "section": one request for the whole spoken text, pauses spliced
+    in afterwards; "fragment" (and the fallback): one concurrent request per
+    text fragment (bounded by `semaphore` when given). Either way the pieces
+    are joined in order.
     """
-    temp_path = input_path.replace(".mp3", "_polished.mp3")
-    
-    # Complex filter: 
-    # 1. Low Shelf (Warmth): 100Hz +3dB
-    # 2. High Shelf (Presence): 8000Hz +2dB
-    # 3. Compression: alimiter
-    filter_str = "equalizer=f=100:t=q:w=1:g=3,equalizer=f=8000:t=q:w=1:g=2,alimiter=limit=0.9:attack=5:release=50"
-    
-    cmd = [
-        "ffmpeg", "-y", "-i", input_path,
-        "-af", filter_str,
-        "-c:a", "libmp3lame", "-q:a", "2",
-        temp_path
-    ]
-    
+    voice = VOICE_PROFILES.get(script_type, VOICE_PROFILES["long"])
+    parts = split_fragments(text)
+    base_name = os.path.splitext(output_file)[0]
+    output_file = base_name + ".wav" # Lossless: the video encode is the only lossy step
+
+    temp_files = []
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        os.replace(temp_path, input_path)
-    except Exception as e:
-        print(f"Audio polish failed: {e}")
+        pieces = None
+        if TTS_MODE == "section" and sum(part not in PAUSE_MAP for part in parts) > 1:
+            pieces = await section_pieces(parts, voice, base_name, semaphore, temp_files)
+        if pieces is None:
+            pieces = await fragment_pieces(parts, voice, base_name, semaphore, temp_files)
+
+        # Decoding/encoding is blocking: keep it off the event loop so other sections keep streaming
+        all_word_timestamps = await asyncio.to_thread(assemble_voiceover, pieces, output_file)
+    finally:
+        # Cleanup temp
+        for f in temp_files:
+            try:
+                os.remove(f)
+            except:
+                pass
+
+    return output_file, all_word_timestamps
+
+def polish_and_encode(pcm, output_path):
+    """
+    Applies EQ and Compression using FFMPEG while writing the only encode:
+    mono float PCM in, stereo 16-bit wav out.
+    """
+    run_ffmpeg([
+        "-f", "f32le", "-ar", VOICE_SAMPLE_RATE, "-ac", "1", "-i", "-",
+        "-af", VOICE_POLISH_FILTER,
+        "-ac", "2", "-c:a", "pcm_s16le",
+        output_path
+    ], input_data=pcm.tobytes())
+    return output_path
+
+async def generate_all_voiceovers(jobs, script_type):
+    """Runs every section's voiceover concurrently, at most TTS_CONCURRENCY requests in flight."""
+    semaphore = asyncio.Semaphore(TTS_CONCURRENCY)
+    return await asyncio.gather(
+        *[generate_voiceover(voice_text, filepath, script_type=script_type, semaphore=semaphore) for voice_text, filepath in jobs],
+        return_exceptions=True
+    )
 
 def create_audio_for_script(script_sections, run_id, script_type="long"):
     """
@@ -212,38 +327,34 @@ def create_audio_for_script(script_sections, run_id, script_type="long"):
     audio_dir = os.path.join(ASSETS_DIR, "temp_audio", run_id)
     os.makedirs(audio_dir, exist_ok=True)
     
-    results = []
-    
     print(f"Generating audio for {len(script_sections)} sections (Type: {script_type}).")
+    sections = []
     for i, section in enumerate(script_sections):
         # Use voiceover if available (new format), else fallback to text (old format)
         voice_text = section.get("voiceover", section.get("text", ""))
-        # Use on_screen_text if available, else fallback to voice_text
-        highlight = section.get("on_screen_text", voice_text)
-        
         if not voice_text:
             print(f"Section {i} has no voiceover/text.")
             continue
-            
-        filename = f"section_{i}.mp3"
-        filepath = os.path.join(audio_dir, filename)
-        
-        # Async run wrapper
-        try:
-            print(f"Generating {filename}...")
-            # Unpack tuple
-            out_path, timestamps = asyncio.run(generate_voiceover(voice_text, filepath, script_type=script_type))
-            results.append({
-                "index": i,
-                "text": highlight, 
-                "voiceover_text": voice_text, 
-                "audio_path": filepath,
-                "timestamps": timestamps, # New detailed timing
-                "duration_est": section.get("duration_seconds", 5) 
-            })
-            print(f"Generated {filename}")
-        except Exception as e:
-            print(f"Error generating voice for section {i}: {e}")
+        sections.append((i, section, voice_text, os.path.join(audio_dir, f"section_{i}.wav")))
+
+    outcomes = asyncio.run(generate_all_voiceovers([(voice_text, filepath) for _, _, voice_text, filepath in sections], script_type))
+    tts_cache.evict()
+
+    results = []
+    for (i, section, voice_text, filepath), outcome in zip(sections, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"Error generating voice for section {i}: {outcome}")
+            continue
+        out_path, timestamps = outcome
+        results.append({
+            "index": i,
+            "text": section.get("on_screen_text", voice_text), # Use on_screen_text if available, else fallback to voice_text
+            "voiceover_text": voice_text, 
+            "audio_path": out_path,
+            "timestamps": timestamps, # New detailed timing
+            "duration_est": section.get("duration_seconds", 5) 
+        })
+        print(f"Generated {os.path.basename(out_path)}")
             
     print(f"Total audio clips generated: {len(results)}")
     return results
@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, JSON, ForeignKey, Boolean
+import threading
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, JSON, ForeignKey, Boolean, BigInteger, inspect
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import OperationalError
 from datetime import datetime
 from app.config import DATABASE_URL
 
@@ -54,6 +56,27 @@ class UploadLog(Base):
 
     video = relationship("Video", back_populates="upload_log")
 
+class MediaCacheEntry(Base):
+    __tablename__ = 'media_cache'
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String, unique=True, nullable=False, index=True) # Source URL (or URL + derivative tag)
+    sha256 = Column(String, nullable=False, index=True) # Content hash; file lives at cache/media/<sha[:2]>/<sha><ext>
+    path = Column(String, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class QueryCacheEntry(Base):
+    __tablename__ = 'query_cache'
+
+    id = Column(Integer, primary_key=True)
+    key = Column(String, unique=True, nullable=False, index=True) # "<provider>:<normalized query>"
+    provider = Column(String, nullable=False) # 'pexels', 'wikipedia'
+    result = Column(JSON)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
 # Database Initialization
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -61,6 +84,24 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 def init_db():
     Base.metadata.create_all(bind=engine)
 
+_ready_tables = set()
+_ready_lock = threading.Lock()
+
+def ensure_tables(*models):
+    """Creates tables added after an existing database was initialized (no migrations here)."""
+    missing = [m for m in models if m.__tablename__ not in _ready_tables]
+    if not missing:
+        return
+    with _ready_lock:
+        for model in missing:
+            try:
+                model.__table__.create(bind=engine, checkfirst=True)
+            except OperationalError:
+                # Another process created it between the check and the CREATE
+                if not inspect(engine).has_table(model.__tablename__):
+                    raise
+            _ready_tables.add(model.__tablename__)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,214 @@
+import numpy as np
+from PIL import Image, ImageDraw
+from moviepy.video.VideoClip import VideoClip
+from app.video.fonts import get_font
+
+# Caption look (matches the original per-frame draw.text calls)
+STROKE_WIDTH = 6
+SHADOW_OFFSET = 6
+CAPTION_EFFECTS = (STROKE_WIDTH, SHADOW_OFFSET) # (stroke width, drop shadow offset) in pixels
+
+class GlyphAtlas:
+    """
+    Caches rasterized caption glyphs.
+    Each (char, font, size, color, effects) sprite is drawn once with its stroke
+    and drop shadow and kept as a premultiplied RGBA float32 tile (values 0-1).
+    """
+    def __init__(self):
+        self._tiles = {}
+        self._scratch = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def get(self, char, font, color, effects=CAPTION_EFFECTS):
+        """
+        Returns (tile, dx, dy) where (dx, dy) is the tile offset from the
+        draw.text origin, or None for glyphs with no visible pixels.
+        """
+        key = (char, getattr(font, "path", None) or id(font), getattr(font, "size", None), color, effects)
+        if key not in self._tiles:
+            self._tiles[key] = self._rasterize(char, font, color, effects)
+        return self._tiles[key]
+
+    def _rasterize(self, char, font, color, effects):
+        if not char.strip():
+            return None
+
+        stroke, shadow = effects
+        l, t, r, b = self._scratch.textbbox((0, 0), char, font=font, stroke_width=stroke)
+        w = r - l + shadow
+        h = b - t + shadow
+        if w <= 0 or h <= 0:
+            return None
+
+        img = Image.new('RGBA', (w, h), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        x, y = -l, -t
+        # Same order as the old per-frame renderer: stroke, shadow, fill
+        if stroke:
+            draw.text((x, y), char, font=font, fill='black', stroke_width=stroke, stroke_fill='black')
+        if shadow:
+            draw.text((x + shadow, y + shadow), char, font=font, fill='black')
+        draw.text((x, y), char, font=font, fill=color)
+
+        tile = np.asarray(img, dtype=np.float32) / 255.0
+        tile[..., :3] *= tile[..., 3:4]
+        return tile, l, t
+
+# Shared by every section of every video rendered in this process
+GLYPH_ATLAS = GlyphAtlas()
+
+def new_canvas(size):
+    """Empty premultiplied RGBA canvas for a (width, height) area."""
+    return np.zeros((size[1], size[0], 4), dtype=np.float32)
+
+def blit(canvas, tile, x, y):
+    """Alpha-blits a premultiplied tile onto the canvas at (x, y), clipped to bounds."""
+    th, tw = tile.shape[:2]
+    ch, cw = canvas.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + tw, cw), min(y + th, ch)
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    src = tile[y0 - y:y1 - y, x0 - x:x1 - x]
+    dst = canvas[y0:y1, x0:x1]
+    dst *= 1.0 - src[..., 3:4]
+    dst += src
+
+def layout_fonts(layout):
+    """Font object for each style in a CaptionLayout (served by the font registry cache)."""
+    return [get_font(layout.font_name, font_size) for color, font_size in layout.styles]
+
+def layout_bounds(layout, atlas=GLYPH_ATLAS, fonts=None, effects=CAPTION_EFFECTS):
+    """
+    Tight (x, y, width, height) box around every glyph sprite of a layout,
+    clipped to the layout area. Empty layouts get a 1x1 box.
+    """
+    if fonts is None:
+        fonts = layout_fonts(layout)
+
+    x0, y0 = layout.size
+    x1, y1 = 0, 0
+    for i in range(len(layout.x)):
+        style_id = layout.style_ids[i]
+        glyph = atlas.get(layout.glyphs[layout.glyph_ids[i]], fonts[style_id], layout.styles[style_id][0], effects)
+        if glyph is None: continue
+
+        tile, dx, dy = glyph
+        gx, gy = int(layout.x[i]) + dx, int(layout.y[i]) + dy
+        x0, y0 = min(x0, gx), min(y0, gy)
+        x1, y1 = max(x1, gx + tile.shape[1]), max(y1, gy + tile.shape[0])
+
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, layout.size[0]), min(y1, layout.size[1])
+    if x0 >= x1 or y0 >= y1:
+        return 0, 0, 1, 1
+    return x0, y0, x1 - x0, y1 - y0
+
+def draw_chars(canvas, layout, start=0, stop=None, atlas=GLYPH_ATLAS, fonts=None, origin=(0, 0), effects=CAPTION_EFFECTS):
+    """
+    Blits characters [start:stop] of a CaptionLayout onto the canvas.
+    `origin` is the canvas top-left in layout coordinates (for cropped canvases).
+    """
+    if fonts is None:
+        fonts = layout_fonts(layout)
+    if stop is None:
+        stop = len(layout.x)
+
+    for i in range(start, stop):
+        style_id = layout.style_ids[i]
+        glyph = atlas.get(layout.glyphs[layout.glyph_ids[i]], fonts[style_id], layout.styles[style_id][0], effects)
+        if glyph is None: continue
+
+        tile, dx, dy = glyph
+        blit(canvas, tile, int(layout.x[i]) + dx - origin[0], int(layout.y[i]) + dy - origin[1])
+
+def split_canvas(canvas):
+    """
+    Converts a premultiplied canvas to what MoviePy expects:
+    straight RGB uint8 frame and a 0-1 float alpha mask.
+    """
+    alpha = canvas[..., 3]
+    rgb = np.zeros(canvas.shape[:2] + (3,), dtype=np.uint8)
+
+    # Only un-premultiply the region that actually holds glyphs
+    rows = np.flatnonzero(alpha.any(axis=1))
+    cols = np.flatnonzero(alpha.any(axis=0))
+    if rows.size:
+        region = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+        scale = 255.0 / np.maximum(alpha[region], 1.0 / 255)
+        rgb[region] = np.minimum(canvas[region][..., :3] * scale[..., None], 255.0)
+    return rgb, alpha
+
+def canvas_to_rgba(canvas):
+    """Straight-alpha RGBA uint8 array (same format as create_text_image used to return)."""
+    rgb, alpha = split_canvas(canvas)
+    return np.dstack([rgb, (alpha * 255).astype(np.uint8)])
+
+class TypewriterRenderer:
+    """
+    Progressive typewriter renderer.
+    Keeps one canvas and only blits the characters added since the previous
+    frame. RGB and alpha come out of the same render and are memoized per
+    visible-character count, so every frame after typing completes is served
+    from the cached final frame.
+    The canvas only covers the bounding box of the caption's glyphs; `offset`
+    is that box's top-left inside the layout area.
+    """
+    def __init__(self, layout, duration, atlas=GLYPH_ATLAS, effects=CAPTION_EFFECTS):
+        self.layout = layout
+        self.atlas = atlas
+        self.effects = effects
+        self.fonts = layout_fonts(layout)
+        self.total_chars = len(layout.x)
+
+        x, y, w, h = layout_bounds(layout, atlas, self.fonts, effects)
+        self.offset = (x, y)
+        self.size = (w, h)
+
+        self.type_duration = min(duration * 0.8, 3.0)
+        if self.type_duration <= 0: self.type_duration = 0.1 # Safety
+
+        self._canvas = new_canvas(self.size)
+        self._drawn = 0
+        self._count = None
+        self._frame = None
+        self._final = None
+
+    def count_at(self, t):
+        progress = min(1.0, max(0.0, t / self.type_duration))
+        return min(int(self.total_chars * progress), self.total_chars)
+
+    def render(self, t):
+        """Returns (rgb uint8 frame, float alpha mask) at time t."""
+        count = self.count_at(t)
+        if count == self.total_chars and self._final is not None:
+            return self._final
+        if count == self._count:
+            return self._frame
+
+        if count < self._drawn:
+            # Seeking backwards (previews, re-renders): start the canvas over
+            self._canvas = new_canvas(self.size)
+            self._drawn = 0
+
+        draw_chars(self._canvas, self.layout, self._drawn, count, self.atlas, self.fonts, self.offset, self.effects)
+        self._drawn = count
+        self._count = count
+        self._frame = split_canvas(self._canvas)
+        if count == self.total_chars:
+            self._final = self._frame
+        return self._frame
+
+class TypewriterClip(VideoClip):
+    """
+    RGBA typewriter caption clip.
+    MoviePy carries alpha as a mask clip; here the frame and the mask are two
+    views of the same TypewriterRenderer pass instead of two separate renders.
+    """
+    def __init__(self, renderer, duration):
+        self.renderer = renderer
+        VideoClip.__init__(self, make_frame=lambda t: renderer.render(t)[0], duration=duration)
+        self.mask = VideoClip(lambda t: renderer.render(t)[1], ismask=True, duration=duration)
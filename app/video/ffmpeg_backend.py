@@ -0,0 +1,154 @@
+"""
+ffmpeg render backend.
+Compiles the same timeline the MoviePy path uses into a single
+filter_complex graph, so decoding, scaling, looping and overlays all run
+natively inside one ffmpeg process. Audio comes in pre-mixed from the
+mixer stage.
+"""
+import os
+import shutil
+import tempfile
+import numpy as np
+from PIL import Image
+from app.config import ASSETS_DIR, KEN_BURNS_ZOOM_RATE, KEN_BURNS_HEADROOM
+from app.media.ffmpeg_tools import run_ffmpeg, describe_error
+from app.video.timeline import caption_geometry, is_video_file, section_frames
+from app.video.layout import layout_caption
+from app.video.captions import TypewriterRenderer
+from app.video.profiles import get_render_profile, x264_args
+from app.video.mixer import mix_soundtrack
+
+def even(value):
+    return int(value) // 2 * 2
+
+def render_caption_frames(text, duration, video_size, is_shorts, profile, out_dir):
+    """
+    Pre-renders the typewriter caption as an RGBA PNG sequence, one frame per
+    output frame while typing plus the final frame (ffmpeg holds it afterwards).
+    Returns (frame pattern, (x, y) position in the video frame).
+    """
+    geometry = caption_geometry(video_size, is_shorts, profile)
+    layout = layout_caption(text, geometry["base_size"], geometry["area_size"], margin=geometry["margin"])
+    renderer = TypewriterRenderer(layout, duration, effects=geometry["effects"])
+    fps = profile["fps"]
+
+    os.makedirs(out_dir, exist_ok=True)
+    frame_no = 0
+    while True:
+        t = frame_no / fps
+        rgb, alpha = renderer.render(t)
+        rgba = np.dstack([rgb, (alpha * 255).astype(np.uint8)])
+        Image.fromarray(rgba, 'RGBA').save(os.path.join(out_dir, f"{frame_no:05d}.png"))
+        frame_no += 1
+        if renderer.count_at(t) >= renderer.total_chars:
+            break
+
+    area_origin = geometry["area_origin"]
+    position = (area_origin[0] + renderer.offset[0], area_origin[1] + renderer.offset[1])
+    return os.path.join(out_dir, "%05d.png"), position
+
+def visual_filter(section, input_index, video_size, fps, label):
+    """Filter chain turning a section's visual input into exactly video_size @ fps for its frame count (see section_frames)."""
+    w, h = video_size
+    frames = section_frames(section, fps)
+    path = section['visual_path']
+
+    if path is None:
+        return f"color=c=black:s={w}x{h}:r={fps}:d={(frames + 1) / fps:.3f},trim=end_frame={frames},setsar=1[{label}]"
+
+    if is_video_file(path):
+        # Input is looped with -stream_loop; cut to the section's frames and scale-to-fill
+        return (
+            f"[{input_index}:v]setpts=PTS-STARTPTS,fps={fps},trim=end_frame={frames},"
+            f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h},setsar=1[{label}]"
+        )
+
+    # Still image: cover at KEN_BURNS_HEADROOM resolution, then zoompan (one output frame per input frame)
+    pw, ph = even(w * KEN_BURNS_HEADROOM), even(h * KEN_BURNS_HEADROOM)
+    return (
+        f"[{input_index}:v]scale={pw}:{ph}:force_original_aspect_ratio=increase,crop={pw}:{ph},"
+        f"zoompan=z='1+{KEN_BURNS_ZOOM_RATE}*on/{fps}':x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)'"
+        f":d=1:s={w}x{h}:fps={fps},trim=end_frame={frames},setsar=1[{label}]"
+    )
+
+def visual_input(section, fps):
+    """ffmpeg input arguments for a section's visual (None for generated black)."""
+    path = section['visual_path']
+    if path is None:
+        return None
+    if is_video_file(path):
+        return ["-stream_loop", "-1", "-i", path]
+    # One spare frame so trim, not the input, decides where the section ends
+    return ["-loop", "1", "-framerate", fps, "-t", f"{(section_frames(section, fps) + 1) / fps:.3f}", "-i", path]
+
+def build_filtergraph(timeline, video_size, is_shorts, profile, work_dir):
+    """Returns (input args, filter_complex string) for the video track of the whole timeline."""
+    fps = profile["fps"]
+    inputs = []
+    filters = []
+
+    def add_input(args):
+        inputs.append(args)
+        return len(inputs) - 1
+
+    concat_pads = []
+    for n, section in enumerate(timeline):
+        d = section['duration']
+
+        # Visual
+        v_args = visual_input(section, fps)
+        v_idx = add_input(v_args) if v_args else None
+        filters.append(visual_filter(section, v_idx, video_size, fps, f"bg{n}"))
+        v_label = f"bg{n}"
+
+        # Highlight caption, held on its last frame until the section ends
+        if section['text']:
+            caption_duration = d - section['caption_start']
+            pattern, (x, y) = render_caption_frames(section['text'], caption_duration, video_size, is_shorts, profile, os.path.join(work_dir, f"caption_{n}"))
+            c_idx = add_input(["-framerate", fps, "-i", pattern])
+            filters.append(f"[{c_idx}:v]format=rgba,setpts=PTS-STARTPTS+{section['caption_start']:.3f}/TB[cap{n}]")
+            filters.append(f"[bg{n}][cap{n}]overlay=x={x}:y={y}:eof_action=repeat:format=auto,format=yuv420p[v{n}]")
+            v_label = f"v{n}"
+
+        concat_pads.append(f"[{v_label}]")
+
+    filters.append(f"{''.join(concat_pads)}concat=n={len(timeline)}:v=1:a=0[vout]")
+    return [arg for args in inputs for arg in args], ";".join(filters)
+
+def render_timeline(timeline, output_path, video_size, is_shorts, music=None, profile=None, audio=True):
+    """
+    Renders a timeline (see build_timeline) to output_path with a single ffmpeg run.
+    The soundtrack is mixed first (mixer.mix_soundtrack) and muxed as a ready
+    wav; music is a music_library track. audio=False writes a video-only file.
+    """
+    profile = profile or get_render_profile()
+    temp_root = os.path.join(ASSETS_DIR, "temp_render")
+    os.makedirs(temp_root, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="ffmpeg_", dir=temp_root)
+
+    try:
+        input_args, graph = build_filtergraph(timeline, video_size, is_shorts, profile, work_dir)
+        maps = ["-map", "[vout]"]
+        audio_args = ["-an"]
+        if audio:
+            mix_path = mix_soundtrack(timeline, os.path.join(work_dir, "mix.wav"), music)
+            mix_idx = input_args.count("-i") # One -i per input
+            input_args += ["-i", mix_path]
+            maps += ["-map", f"{mix_idx}:a"]
+            audio_args = ["-c:a", "aac"]
+        print(f"Rendering {len(timeline)} sections with ffmpeg filtergraph...")
+        run_ffmpeg(input_args + [
+            "-filter_complex", graph,
+        ] + maps + [
+            "-r", profile["fps"],
+        ] + x264_args(profile) + audio_args + [
+            "-movflags", "+faststart",
+            output_path
+        ])
+    except Exception as e:
+        raise RuntimeError(f"ffmpeg render failed: {describe_error(e)}") from e
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Rendered: {output_path}")
+    return output_path
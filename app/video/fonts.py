@@ -0,0 +1,43 @@
+import os
+from functools import lru_cache
+from PIL import ImageFont
+from app.config import FONTS_DIR, FONT_CACHE_SIZE
+
+# Used when the requested font file is not in assets/fonts
+FALLBACK_FONT = "Montserrat-Black.ttf"
+SYSTEM_FONT = "arial.ttf"
+
+def scan_fonts(fonts_dir=FONTS_DIR):
+    """Maps font file names to paths for every .ttf/.otf in the fonts folder."""
+    if not os.path.isdir(fonts_dir):
+        return {}
+    return {
+        f: os.path.join(fonts_dir, f)
+        for f in os.listdir(fonts_dir)
+        if f.lower().endswith(('.ttf', '.otf'))
+    }
+
+# Resolved once per process
+AVAILABLE_FONTS = scan_fonts()
+
+def resolve_font_path(font_name="TheBoldFont.ttf"):
+    """
+    Resolves a font name to a file path.
+    Fallback chain: requested font -> Montserrat-Black.ttf -> system arial.
+    """
+    for name in (font_name, FALLBACK_FONT):
+        if name in AVAILABLE_FONTS:
+            return AVAILABLE_FONTS[name]
+    return SYSTEM_FONT
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def load_font(path, size):
+    """Cached FreeTypeFont for (path, size); least recently used entries are evicted."""
+    try:
+        return ImageFont.truetype(path, size)
+    except Exception as e:
+        print(f"Font load failed for {path} ({size}px): {e}, using default font")
+        return ImageFont.load_default()
+
+def get_font(font_name="TheBoldFont.ttf", size=70):
+    return load_font(resolve_font_path(font_name), int(size))
@@ -0,0 +1,43 @@
+from PIL import Image
+import numpy as np
+from moviepy.video.VideoClip import VideoClip
+from app.config import KEN_BURNS_ZOOM_RATE, KEN_BURNS_HEADROOM
+from app.media.ingest import load_presized
+
+class KenBurnsClip(VideoClip):
+    """
+    Slow center zoom over a still image, already filled and cropped to `size`.
+    The source is resampled once, to just above output resolution; every frame
+    is then a sub-pixel crop box plus one fixed-size resample, so per-frame
+    cost does not depend on how large the original photo was.
+    """
+    def __init__(self, image_path, duration, size, zoom_rate=KEN_BURNS_ZOOM_RATE, headroom=KEN_BURNS_HEADROOM):
+        target_w, target_h = size
+        # Draft-decoded and cut to the frame already (a no-op for ingested images)
+        img = load_presized(image_path, size, headroom)
+
+        # Scale that makes the image cover the frame (same as scale-to-fill before cropping)
+        w, h = img.size
+        cover = max(target_w / w, target_h / h)
+
+        # Keep some extra pixels for the zoom, but never upsample beyond the cover size
+        self.detail = max(1.0, min(headroom, 1.0 / cover))
+        pw = max(target_w, round(w * cover * self.detail))
+        ph = max(target_h, round(h * cover * self.detail))
+        self.image = img.resize((pw, ph), Image.LANCZOS)
+        self.zoom_rate = zoom_rate
+        self.out_size = (target_w, target_h)
+
+        VideoClip.__init__(self, make_frame=self.make_frame_at, duration=duration)
+
+    def crop_box(self, t):
+        """Crop window (left, top, right, bottom) in pre-scaled image coordinates at time t."""
+        zoom = 1 + self.zoom_rate * t
+        tw, th = self.out_size
+        pw, ph = self.image.size
+        bw = tw * self.detail / zoom
+        bh = th * self.detail / zoom
+        return ((pw - bw) / 2, (ph - bh) / 2, (pw + bw) / 2, (ph + bh) / 2)
+
+    def make_frame_at(self, t):
+        return np.asarray(self.image.resize(self.out_size, Image.BILINEAR, box=self.crop_box(t)))
@@ -0,0 +1,209 @@
+import os
+import json
+import hashlib
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+from app.config import LAYOUT_CACHE_DIR
+from app.video.fonts import load_font, resolve_font_path
+
+# Bump when the layout rules change so stale on-disk layouts are ignored
+LAYOUT_VERSION = 1
+
+# Struct-of-arrays caption layout, one entry per character (inter-word spaces included,
+# they pace the typewriter). glyph_ids index into `glyphs`, style_ids into `styles`,
+# which holds (color, font_size) pairs.
+CaptionLayout = namedtuple("CaptionLayout", ["x", "y", "glyph_ids", "style_ids", "glyphs", "styles", "font_name", "size"])
+
+_memo = {}
+
+def get_text_style(word):
+    """
+    Determines color and font size multiplier for a single word.
+    """
+    w_lower = word.lower()
+    
+    # Defaults
+    color = 'white'
+    size_mult = 1.0
+    
+    # Clean punctuation for check
+    clean_word = "".join(c for c in w_lower if c.isalnum())
+    
+    # 1. Stats/Numbers (Highest Priority)
+    if any(char.isdigit() for char in word):
+        color = 'yellow'
+        size_mult = 1.4 # Big Pop
+        return color, size_mult
+
+    # 2. Colors based on sentiment/topic
+    if any(x in w_lower for x in ['warning', 'danger', 'brake', 'crash', 'fail', 'bad', 'cons', 'problem']):
+        color = '#FF3333' # Red
+        size_mult = 1.2
+    elif any(x in w_lower for x in ['mileage', 'efficient', 'price', 'cheap', 'good', 'pros', 'best', 'success', 'looks', 'sharp', 'stable', 'both', 'smarter']):
+        color = '#39FF14' # Neon Green
+        size_mult = 1.2
+    elif any(x in w_lower for x in ['engine', 'power', 'torque', 'ccs', 'hp', 'nm', 'fast', 'speed', 'cc', 'ps', 'big']):
+        color = 'yellow'
+        size_mult = 1.3
+    elif any(x in w_lower for x in ['feature', 'screen', 'led', 'light', 'abs', 'fi', 'modes', 'easymoto']):
+        color = 'cyan'
+        size_mult = 1.3
+
+    # 3. Subject/Object Heuristic (Capitalized words that aren't start of sentence?)
+    # Hard to detect perfectly, but proper nouns often matter.
+    # If it looks like a model name (e.g. Ntorq, Xpulse, R15)
+    if w_lower in ['hero', 'honda', 'yamaha', 'tvs', 'bajaj', 'ktm', 'royal', 'enfield', 'xpulse', 'ntorq', 'r15', 'duke', 'classic', 'hunter']:
+        color = '#FF00FF' # Magenta/Purple
+        size_mult = 1.3
+        
+    return color, size_mult
+
+@lru_cache(maxsize=4096)
+def char_width(font_path, font_size, char):
+    """Ink width of a single character at its final styled size."""
+    l, t, r, b = load_font(font_path, font_size).getbbox(char)
+    return r - l
+
+def measure_words(words, base_fontsize, font_path):
+    """
+    Styles and measures every word once.
+    Returns [(word, color, font_size, char_widths, word_width)].
+    """
+    measured = []
+    for word in words:
+        color, size_mult = get_text_style(word)
+        font_size = int(base_fontsize * size_mult)
+        widths = [char_width(font_path, font_size, c) for c in word]
+        measured.append((word, color, font_size, widths, sum(widths)))
+    return measured
+
+def wrap_words(measured, max_w):
+    """Greedy wrap on the cached styled widths. Returns lists of word indices per line."""
+    lines = []
+    current = []
+    current_w = 0.0
+    for i, (word, color, font_size, widths, word_w) in enumerate(measured):
+        gap = measured[current[-1]][2] * 0.25 if current else 0.0
+        if current and current_w + gap + word_w > max_w:
+            lines.append(current)
+            current = []
+            current_w = 0.0
+            gap = 0.0
+        current.append(i)
+        current_w += gap + word_w
+    if current:
+        lines.append(current)
+    return lines
+
+def compute_layout(text, base_fontsize=70, size=(1080, 1920), font_name="TheBoldFont.ttf", margin=50):
+    """
+    Single-pass caption layout: measure each styled word once, wrap on those
+    widths, then place characters. Lines are centered on their real (styled) width.
+    """
+    font_path = resolve_font_path(font_name)
+    measured = measure_words(text.split(), base_fontsize, font_path)
+    lines = wrap_words(measured, size[0] - (2 * margin))
+
+    line_height = int(base_fontsize * 1.2)
+    start_y = (size[1] - len(lines) * line_height) / 2
+
+    xs, ys, glyph_ids, style_ids = [], [], [], []
+    glyphs, styles = {}, {}
+
+    def emit(char, x, y, style):
+        xs.append(x)
+        ys.append(y)
+        glyph_ids.append(glyphs.setdefault(char, len(glyphs)))
+        style_ids.append(styles.setdefault(style, len(styles)))
+
+    last_word = len(measured) - 1
+    for line_no, line in enumerate(lines):
+        gaps = sum(measured[i][2] * 0.25 for i in line[:-1])
+        line_w = sum(measured[i][4] for i in line) + gaps
+        current_x = (size[0] - line_w) / 2
+        y = start_y + (line_no * line_height)
+
+        for i in line:
+            word, color, font_size, widths, word_w = measured[i]
+            style = (color, font_size)
+            # Center larger words vertically within the line
+            y_adj = y + (line_height - font_size * 1.2) / 2
+            for char, cw in zip(word, widths):
+                emit(char, current_x, y_adj, style)
+                current_x += cw
+
+            space_w = font_size * 0.25
+            if i != last_word:
+                emit(" ", current_x, y, style)
+            current_x += space_w
+
+    return CaptionLayout(
+        x=np.array(xs, dtype=np.float32),
+        y=np.array(ys, dtype=np.float32),
+        glyph_ids=np.array(glyph_ids, dtype=np.int32),
+        style_ids=np.array(style_ids, dtype=np.int16),
+        glyphs=list(glyphs),
+        styles=list(styles),
+        font_name=font_name,
+        size=tuple(size),
+    )
+
+def layout_cache_key(text, base_fontsize, size, font_name, margin):
+    font_file = os.path.basename(resolve_font_path(font_name))
+    raw = json.dumps([LAYOUT_VERSION, text, list(size), base_fontsize, font_file, margin])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def save_layout(layout, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        tmp_path,
+        x=layout.x, y=layout.y,
+        glyph_ids=layout.glyph_ids, style_ids=layout.style_ids,
+        glyphs=np.array(layout.glyphs, dtype=str),
+        colors=np.array([c for c, s in layout.styles], dtype=str),
+        font_sizes=np.array([s for c, s in layout.styles], dtype=np.int32),
+        font_name=np.array(layout.font_name),
+        size=np.array(layout.size, dtype=np.int32),
+    )
+    os.replace(tmp_path, path)
+
+def load_layout(path):
+    with np.load(path, allow_pickle=False) as data:
+        return CaptionLayout(
+            x=data["x"], y=data["y"],
+            glyph_ids=data["glyph_ids"], style_ids=data["style_ids"],
+            glyphs=[str(g) for g in data["glyphs"]],
+            styles=[(str(c), int(s)) for c, s in zip(data["colors"], data["font_sizes"])],
+            font_name=str(data["font_name"]),
+            size=tuple(int(v) for v in data["size"]),
+        )
+
+def layout_caption(text, base_fontsize=70, size=(1080, 1920), font_name="TheBoldFont.ttf", margin=50):
+    """
+    Cached caption layout.
+    Memoized in-process and persisted under LAYOUT_CACHE_DIR, keyed by
+    (text, area size, base size, font, margin), so reruns skip layout entirely.
+    """
+    key = layout_cache_key(text, base_fontsize, size, font_name, margin)
+    if key in _memo:
+        return _memo[key]
+
+    path = os.path.join(LAYOUT_CACHE_DIR, key[:2], key + ".npz")
+    layout = None
+    if os.path.exists(path):
+        try:
+            layout = load_layout(path)
+        except Exception as e:
+            print(f"Discarding unreadable layout cache {path}: {e}")
+
+    if layout is None:
+        layout = compute_layout(text, base_fontsize, size, font_name, margin)
+        try:
+            save_layout(layout, path)
+        except Exception as e:
+            print(f"Layout cache write failed (non-critical): {e}")
+
+    _memo[key] = layout
+    return layout
@@ -0,0 +1,82 @@
+"""
+Final soundtrack mixer.
+Builds the whole mix in one ffmpeg graph before any video is encoded:
+section voiceovers laid end to end, a loop-ready music slice from the
+music library (streamed in as raw PCM, no decode) ducked under them by a
+sidechain compressor keyed on the voice, then loudness normalized to
+MIX_TARGET_LUFS. Every render path muxes the resulting wav
+instead of mixing audio on the per-frame path.
+"""
+import numpy as np
+from app.config import MUSIC_VOLUME, MIX_TARGET_LUFS, MIX_SAMPLE_RATE, DUCK_THRESHOLD, DUCK_RATIO, DUCK_ATTACK_MS, DUCK_RELEASE_MS
+from app.media.ffmpeg_tools import run_ffmpeg
+from app.media.music_library import music_slice, track_gain
+
+AUDIO_FORMAT = f"aformat=sample_fmts=fltp:sample_rates={MIX_SAMPLE_RATE}:channel_layouts=stereo"
+
+def soundtrack_graph(timeline, music_gain=None, sfx=()):
+    """
+    Returns (input args, filter_complex) producing [mix].
+    music_gain: when set, music of the full timeline length is read as
+    interleaved f32le stereo from stdin and scaled by it before ducking.
+    sfx: optional (path, start seconds) one-shots laid over the voice.
+    """
+    inputs = []
+    filters = []
+
+    def add_input(args):
+        inputs.append(args)
+        return len(inputs) - 1
+
+    # Voice: each section padded/trimmed to its timeline duration, back to back
+    for n, section in enumerate(timeline):
+        idx = add_input(["-i", section['audio_path']])
+        filters.append(f"[{idx}:a]{AUDIO_FORMAT},apad,atrim=duration={section['duration']:.3f},asetpts=PTS-STARTPTS[v{n}]")
+    voice_pads = "".join(f"[v{n}]" for n in range(len(timeline)))
+
+    if sfx:
+        filters.append(f"{voice_pads}concat=n={len(timeline)}:v=0:a=1[dry]")
+        for k, (path, start) in enumerate(sfx):
+            idx = add_input(["-i", path])
+            delay = int(start * 1000)
+            filters.append(f"[{idx}:a]{AUDIO_FORMAT},adelay={delay}|{delay}[sfx{k}]")
+        pads = "".join(f"[sfx{k}]" for k in range(len(sfx)))
+        filters.append(f"[dry]{pads}amix=inputs={len(sfx) + 1}:duration=first:normalize=0[voice]")
+    else:
+        filters.append(f"{voice_pads}concat=n={len(timeline)}:v=0:a=1[voice]")
+
+    if music_gain is not None:
+        idx = add_input(["-f", "f32le", "-ar", MIX_SAMPLE_RATE, "-ac", 2, "-i", "pipe:0"])
+        filters.append(f"[{idx}:a]{AUDIO_FORMAT},volume={MUSIC_VOLUME * music_gain:.4f}[music]")
+        filters.append("[voice]asplit=2[lead][key]")
+        filters.append(
+            f"[music][key]sidechaincompress=threshold={DUCK_THRESHOLD}:ratio={DUCK_RATIO}"
+            f":attack={DUCK_ATTACK_MS}:release={DUCK_RELEASE_MS}[bed]"
+        )
+        filters.append("[lead][bed]amix=inputs=2:duration=first:normalize=0[premix]")
+    else:
+        filters.append("[voice]anull[premix]")
+
+    # loudnorm works at 192 kHz internally; bring it back to the delivery rate
+    filters.append(f"[premix]loudnorm=I={MIX_TARGET_LUFS}:TP=-1.5:LRA=11,aresample={MIX_SAMPLE_RATE}[mix]")
+    return [arg for args in inputs for arg in args], ";".join(filters)
+
+def mix_soundtrack(timeline, output_path, music=None, sfx=()):
+    """
+    Renders the full mix for a timeline to output_path: 16-bit stereo wav, or
+    AAC for .m4a (for muxers that stream-copy the audio, like MoviePy's).
+    music: a track from music_library.pick_track(), or None.
+    """
+    music_pcm = None
+    if music:
+        music_pcm = music_slice(music, sum(s['duration'] for s in timeline))
+        music_pcm = memoryview(np.ascontiguousarray(music_pcm)).cast("B") # Zero-copy for a memmap view
+    input_args, graph = soundtrack_graph(timeline, track_gain(music) if music else None, sfx)
+    codec = ["-c:a", "aac", "-b:a", "192k"] if output_path.endswith(".m4a") else ["-c:a", "pcm_s16le"]
+    run_ffmpeg(input_args + [
+        "-filter_complex", graph,
+        "-map", "[mix]",
+    ] + codec + [
+        output_path
+    ], input_data=music_pcm)
+    return output_path
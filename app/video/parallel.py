@@ -0,0 +1,105 @@
+"""
+Parallel per-section rendering.
+Sections are independent (own audio, visual and caption), so each one is
+encoded to its own video-only segment in a process pool with identical
+codec parameters. Segments are then joined with the ffmpeg concat demuxer
+(stream copy) while the mixer renders the soundtrack, and the two are
+muxed together in a last pass.
+"""
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from app.config import ASSETS_DIR, RENDER_WORKERS
+from app.video.profiles import get_render_profile
+from app.video.timeline import section_frames
+from app.media.ffmpeg_tools import run_ffmpeg, describe_error
+from app.video.mixer import mix_soundtrack
+
+def worker_count(section_count):
+    workers = RENDER_WORKERS or os.cpu_count() or 1
+    return max(1, min(workers, section_count))
+
+def render_segment(section, segment_path, video_size, is_shorts, backend, profile):
+    """
+    Renders one timeline section to segment_path, video only (audio comes from
+    the mixer). The segment gets exactly section_frames() frames, so the
+    stream-copied concat lines up with the soundtrack's exact durations.
+    """
+
+    if backend == "ffmpeg":
+        from app.video.ffmpeg_backend import render_timeline
+        render_timeline([section], segment_path, video_size, is_shorts, profile=profile, audio=False)
+        return segment_path
+
+    from moviepy.audio.io.AudioFileClip import AudioFileClip
+    from app.video.composer import build_section_clip
+    audio_clip = AudioFileClip(section['audio_path'])
+    clip = build_section_clip(section, video_size, is_shorts, audio_clip, profile)
+    # MoviePy writes one frame per 1/fps step below the duration: land mid-frame to get exactly n
+    frames = section_frames(section, profile["fps"])
+    clip = clip.set_duration((frames - 0.5) / profile["fps"])
+    clip.write_videofile(
+        segment_path, fps=profile["fps"], codec="libx264", audio=False,
+        preset=profile["preset"], threads=profile["threads"],
+        ffmpeg_params=["-crf", str(profile["crf"]), "-pix_fmt", "yuv420p"],
+        logger=None
+    )
+    clip.close()
+    audio_clip.close()
+    return segment_path
+
+def concat_segments(segment_paths, output_path, work_dir):
+    """Joins segments with the concat demuxer, copying streams (no re-encode)."""
+    list_path = os.path.join(work_dir, "segments.txt")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in segment_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path])
+    return output_path
+
+def mux_soundtrack(video_path, audio_path, output_path):
+    """Adds the mixed soundtrack to the joined video; video is stream-copied."""
+    run_ffmpeg([
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v", "-map", "1:a",
+        "-c:v", "copy", "-c:a", "aac",
+        "-movflags", "+faststart",
+        output_path
+    ])
+    return output_path
+
+def render_parallel(timeline, output_path, video_size, is_shorts, music=None, backend="moviepy", profile=None):
+    """Renders sections concurrently, then stream-copies them into output_path."""
+    profile = profile or get_render_profile()
+    temp_root = os.path.join(ASSETS_DIR, "temp_render")
+    os.makedirs(temp_root, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="parallel_", dir=temp_root)
+
+    workers = worker_count(len(timeline))
+    # Split encoder threads across workers instead of oversubscribing every core
+    profile = dict(profile, threads=profile["threads"] or max(1, (os.cpu_count() or 1) // workers))
+    print(f"Rendering {len(timeline)} sections on {workers} workers ({backend})...")
+
+    try:
+        segment_paths = [os.path.join(work_dir, f"segment_{n:03d}.mp4") for n in range(len(timeline))]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(render_segment, section, path, video_size, is_shorts, backend, profile)
+                for section, path in zip(timeline, segment_paths)
+            ]
+            # The soundtrack only needs the voice files, so mix it while segments encode
+            mix_path = mix_soundtrack(timeline, os.path.join(work_dir, "mix.wav"), music)
+            for future in futures:
+                future.result()
+
+        joined_path = concat_segments(segment_paths, os.path.join(work_dir, "joined.mp4"), work_dir)
+        mux_soundtrack(joined_path, mix_path, output_path)
+    except Exception as e:
+        raise RuntimeError(f"Parallel render failed: {describe_error(e)}") from e
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Rendered: {output_path}")
+    return output_path
@@ -0,0 +1,26 @@
+from app import config
+
+def get_render_profile(name=None):
+    """Named render profile from config.RENDER_PROFILES (default: config.RENDER_PROFILE)."""
+    name = name or config.RENDER_PROFILE
+    if name not in config.RENDER_PROFILES:
+        print(f"Unknown render profile '{name}', using 'final'.")
+        name = "final"
+    return dict(config.RENDER_PROFILES[name], name=name)
+
+def scaled_size(size, scale):
+    """Scales a (w, h) size, keeping both sides even for yuv420p."""
+    return (int(size[0] * scale) // 2 * 2, int(size[1] * scale) // 2 * 2)
+
+def get_video_size(is_shorts, profile=None):
+    profile = profile or get_render_profile()
+    base = config.SHORTS_SIZE if is_shorts else config.LONG_VIDEO_SIZE
+    return scaled_size(base, profile["scale"])
+
+def x264_args(profile):
+    """Encoder arguments shared by every render path so outputs (and segments) match."""
+    return [
+        "-c:v", "libx264", "-pix_fmt", "yuv420p",
+        "-preset", profile["preset"], "-crf", str(profile["crf"]),
+        "-threads", str(profile["threads"]),
+    ]
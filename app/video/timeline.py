@@ -0,0 +1,107 @@
+import random
+from app.config import LONG_VIDEO_SIZE, SHORTS_SIZE
+from app.video.captions import STROKE_WIDTH, SHADOW_OFFSET
+from app.video.profiles import get_render_profile
+from app.media.ffmpeg_tools import probe_duration
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov')
+
+def is_video_file(path):
+    return path.lower().endswith(VIDEO_EXTENSIONS)
+
+def caption_start_time(text, timestamps):
+    """
+    When the highlight caption starts inside its section.
+    Naive matching: the first spoken occurrence of the highlight's first word,
+    else the start of the section. The caption stays up until the section ends
+    ("text disappears only when the whole sentence is read").
+    """
+    if not (timestamps and text):
+        return 0.0
+
+    search_words = [w.lower().strip(",.!?") for w in text.split()]
+    if not search_words:
+        return 0.0
+
+    first_word = search_words[0]
+    hit = next((t for t in timestamps if t['word'].lower().strip(",.!?") == first_word), None)
+    return float(hit['start']) if hit else 0.0
+
+def caption_geometry(video_size, is_shorts, profile=None):
+    """
+    Highlight caption placement for a (possibly profile-scaled) video size.
+    The text area spans the frame width, 40% of its height, centered; font
+    size, margin and stroke/shadow scale with the frame.
+    Returns dict(base_size, area_size, area_origin, margin, effects).
+    """
+    target_w, target_h = video_size
+    nominal_w = (SHORTS_SIZE if is_shorts else LONG_VIDEO_SIZE)[0]
+    scale = target_w / nominal_w
+    profile = profile or get_render_profile()
+
+    text_area_size = (target_w, int(target_h*0.4))
+    if profile["caption_effects"]:
+        effects = (max(1, round(STROKE_WIDTH * scale)), max(1, round(SHADOW_OFFSET * scale)))
+    else:
+        effects = (0, 0)
+
+    return {
+        "base_size": int((110 if is_shorts else 90) * scale), # Huge text
+        "area_size": text_area_size,
+        "area_origin": ((target_w - text_area_size[0]) // 2, (target_h - text_area_size[1]) // 2),
+        "margin": int(50 * scale),
+        "effects": effects,
+    }
+
+def build_timeline(audio_data, media_map, duration_of=probe_duration):
+    """
+    Resolves everything a renderer needs per section, in playback order:
+    audio, duration, global start time, chosen visual and caption window.
+    Shared by every render backend so they produce the same edit.
+    """
+    timeline = []
+    current_time = 0.0
+    for section in audio_data:
+        idx = section['index']
+        text = section['text'] # This is HIGHLIGHT TEXT
+        duration = duration_of(section['audio_path'])
+
+        media_paths = media_map.get(idx, [])
+        visual_path = random.choice(media_paths) if media_paths else None
+
+        timeline.append({
+            "index": idx,
+            "audio_path": section['audio_path'],
+            "duration": duration,
+            "start": current_time,
+            "visual_path": visual_path,
+            "text": text,
+            "voiceover_text": section.get('voiceover_text', text), # This is FULL TEXT
+            "caption_start": caption_start_time(text, section.get('timestamps', [])),
+        })
+        current_time += duration
+    return timeline
+
+def section_frames(section, fps):
+    """
+    Frame count a section gets in the output. Cuts fall on the global frame
+    grid, so the per-section rounding never accumulates into drift against
+    the audio, which is laid out on exact durations.
+    """
+    return round((section['start'] + section['duration']) * fps) - round(section['start'] * fps)
+
+def format_srt_time(seconds):
+    millis = int((seconds - int(seconds)) * 1000)
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    seconds = int(seconds % 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02},{millis:03}"
+
+def write_srt(timeline, srt_path):
+    """One subtitle entry per section, spanning its audio, with the full voiceover text."""
+    with open(srt_path, 'w', encoding='utf-8') as f:
+        for i, section in enumerate(timeline):
+            f.write(f"{i + 1}\n")
+            f.write(f"{format_srt_time(section['start'])} --> {format_srt_time(section['start'] + section['duration'])}\n")
+            f.write(f"{section['voiceover_text']}\n\n")
+    print(f"Generated subtitles: {srt_path}")
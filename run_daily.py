@@ -133,6 +133,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--type", type=str, default="all", choices=["all", "long", "shorts"], help="Type of video to generate")
     parser.add_argument("--dry-run", action="store_true", help="Skip upload")
+    parser.add_argument("--backend", type=str, default=None, choices=["moviepy", "ffmpeg"], help="Video render backend (default: config.RENDER_BACKEND)")
+    parser.add_argument("--parallel", action="store_true", help="Render sections in parallel and join with stream copy")
+    parser.add_argument("--profile", type=str, default=None, choices=["draft", "preview", "final"], help="Render profile (default: config.RENDER_PROFILE)")
     args = parser.parse_args()
     
     # Propagate DRY_RUN via config module modification or env argument?
@@ -147,6 +150,8 @@ if __name__ == "__main__":
     print("-" * 30)
     print(f"Running daily job (Type: {args.type})")
     print(f"Dry Run: {config.DRY_RUN or args.dry_run}")
+    print(f"Render Backend: {args.backend or config.RENDER_BACKEND}{' (parallel sections)' if config.RENDER_PARALLEL or args.parallel else ''}")
+    print(f"Render Profile: {args.profile or config.RENDER_PROFILE}")
     print(f"Gemini Key: {'Present' if config.GEMINI_API_KEY else 'MISSING'}")
     print(f"Pexels Key: {'Present' if config.PEXELS_API_KEY else 'MISSING'}")
     print(f"Groq Key: {'Present' if config.GROQ_API_KEY else 'MISSING'}")
@@ -154,5 +159,11 @@ if __name__ == "__main__":
 
     if args.dry_run:
         config.DRY_RUN = True
+    if args.backend:
+        config.RENDER_BACKEND = args.backend
+    if args.parallel:
+        config.RENDER_PARALLEL = True
+    if args.profile:
+        config.RENDER_PROFILE = args.profile
         
     run_daily_job(target_type=args.type)
@@ -53,4 +53,11 @@ async def main():
     print(f"Done: {out_file}")
 
 if __name__ == "__main__":
+    import argparse
+    from app import config
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", type=str, default="draft", choices=["draft", "preview", "final"], help="Render profile (QA renders default to draft)")
+    args = parser.parse_args()
+    config.RENDER_PROFILE = args.profile
+
     asyncio.run(main())